@@ -0,0 +1,126 @@
+#!/usr/bin/env python3 -B
+"""
+Check that targeted parsing of dictionary pages matches a full parse.
+
+Runs the Yahoo and Cambridge extraction code over saved result pages, once on
+a full html.parser tree (the old behaviour) and once with the configured
+parser restricted to the parts of the page the fetchers read, then reports
+whether the extracted data is identical along with parse time and peak
+memory for both.  No network access is needed once fixtures are saved.
+
+Fixtures live in benchmarks/fixtures/<source_name>/<word>.html; the script
+fails if there are none, or if a page differs or yields no entry.  Save
+more (or refresh them from the live sites) with:
+
+    python benchmarks/compare_parsers.py --save yahoo_en_tc memorize example
+    python benchmarks/compare_parsers.py --save cambridge_en_tc memorize example
+
+then compare:
+
+    python benchmarks/compare_parsers.py [--parser lxml] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from quickfill import http_session
+from quickfill.fetchers import CambridgeECFetcher, YahooFetcher
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# source name -> (fetcher, extract(fetcher, soup, word))
+SOURCES = {
+    YahooFetcher.source_name(): (YahooFetcher(), lambda f, soup, word: f.extract(soup, word)),
+    CambridgeECFetcher.source_name(): (CambridgeECFetcher(), lambda f, soup, word: f._parse_cambridge(soup)),
+}
+
+
+def save_fixtures(source, words, fixtures_dir):
+    fetcher, _ = SOURCES[source]
+    out_dir = fixtures_dir / source
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for word in words:
+        resp = http_session.get(fetcher.page_url(word), headers=getattr(fetcher, "headers", None))
+        resp.raise_for_status()
+        (out_dir / f"{word}.html").write_text(resp.text, encoding="utf-8")
+        print(f"saved {out_dir / (word + '.html')}")
+
+
+def measure(fetcher, extract, html, word, parser, targeted, repeat):
+    """Return (result, best seconds, peak bytes) for parse + extract."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extract(fetcher, fetcher.make_soup(html, parser, targeted=targeted), word)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    extract(fetcher, fetcher.make_soup(html, parser, targeted=targeted), word)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def fixture_pages(fixtures_dir):
+    """Yield (source, fetcher, extract, path) for every saved page."""
+    for source, (fetcher, extract) in SOURCES.items():
+        for path in sorted((fixtures_dir / source).glob("*.html")):
+            yield source, fetcher, extract, path
+
+
+def compare(fixtures_dir, parser, repeat):
+    """
+    Print one line per fixture; return the number of failures (pages whose
+    targeted result differs, or that yield no entry at all), or None if
+    there are no fixtures.
+    """
+    failures = 0
+    found = False
+    print(f"{'fixture':40} {'same':>5} {'full ms':>9} {'targeted ms':>12} {'full KiB':>9} {'targeted KiB':>13}")
+    for source, fetcher, extract, path in fixture_pages(fixtures_dir):
+        found = True
+        html = path.read_text(encoding="utf-8")
+        word = path.stem
+        full, full_t, full_mem = measure(fetcher, extract, html, word, "html.parser", False, repeat)
+        fast, fast_t, fast_mem = measure(fetcher, extract, html, word, parser, True, repeat)
+        # Identical empty results would prove nothing
+        status = "empty" if not full or full.get("pos_sections") == [] else (
+            "yes" if full == fast else "NO")
+        failures += status != "yes"
+        print(f"{source + '/' + path.name:40} {status:>5} "
+              f"{full_t * 1000:9.1f} {fast_t * 1000:12.1f} "
+              f"{full_mem / 1024:9.0f} {fast_mem / 1024:13.0f}")
+    if not found:
+        print(f"No fixtures in {fixtures_dir}; save some with --save (see --help).", file=sys.stderr)
+        return None
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="fixtures directory")
+    ap.add_argument("--parser", default="html.parser", help="parser for the targeted run (e.g. lxml)")
+    ap.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is reported)")
+    ap.add_argument("--save", nargs="+", metavar=("SOURCE", "WORD"),
+                    help="download result pages for WORDs from SOURCE into the fixtures directory")
+    args = ap.parse_args()
+
+    if args.save:
+        source, *words = args.save
+        if source not in SOURCES or not words:
+            ap.error(f"--save needs a source ({', '.join(SOURCES)}) and at least one word")
+        save_fixtures(source, words, args.fixtures)
+        return 0
+
+    failures = compare(args.fixtures, args.parser, args.repeat)
+    return 1 if failures is None or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
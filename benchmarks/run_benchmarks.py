@@ -0,0 +1,315 @@
+#!/usr/bin/env python3 -B
+"""
+Offline benchmarks for the CSV seeker and the web scrapers' parsing code.
+
+Generates synthetic dictionaries (sorted and unsorted, 10k rows up to 10M)
+under benchmarks/data/, then times CSVSeeker hits, misses and search_many
+batches with and without the sidecar index, plus index build time, and
+the same lookups on block-compressed (.qfz) copies.  The HTML fixtures in
+benchmarks/fixtures/ (see compare_parsers.py --save) are run through the
+Yahoo and Cambridge parsing code; the run fails without them unless
+--skip-parse is given.  Nothing touches the network.
+
+Results are written as JSON so runs can be compared:
+
+    python benchmarks/run_benchmarks.py --rows 10k,100k,1m --output before.json
+    ... change things ...
+    python benchmarks/run_benchmarks.py --rows 10k,100k,1m --output after.json --compare before.json
+
+--compare lists every timing that got more than --threshold (default 20%)
+slower and exits non-zero if there are any.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from quickfill.compressed_csv import compress_csv
+from quickfill.csv_seeker import CSVSeeker
+
+BENCH_DIR = Path(__file__).parent
+DATA_DIR = BENCH_DIR / "data"
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+# Unsorted files list row n * SHUFFLE_MULTIPLIER % rows at position n, a
+# repeatable shuffle that needs no memory (the multiplier must be coprime
+# with the row count)
+SHUFFLE_MULTIPLIER = 7919
+
+
+def parse_count(text):
+    """Parse '10k', '2.5m', '1000' into an int."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def key_width(rows):
+    width = 1
+    while len(ALPHABET) ** width < rows:
+        width += 1
+    return width + 1  # room for words the generator never uses
+
+
+def make_word(i, width):
+    """Fixed-width base-26 word; lexicographic order equals numeric order."""
+    chars = []
+    for _ in range(width):
+        i, r = divmod(i, len(ALPHABET))
+        chars.append(ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+def generate_csv(path, rows, sorted_rows):
+    """Write a word,translation,extra CSV of `rows` data rows."""
+    width = key_width(rows)
+    multiplier = SHUFFLE_MULTIPLIER
+    while math.gcd(rows, multiplier) != 1:
+        multiplier += 2
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write("word,translation,extra\n")
+        for n in range(rows):
+            # Even numbers only, so that odd ones are guaranteed misses
+            i = 2 * (n if sorted_rows else n * multiplier % rows)
+            word = make_word(i, width)
+            f.write(f"{word},definition of {word} number {i},note {i % 97}\n")
+    os.replace(tmp_path, path)
+
+
+def dataset(data_dir, rows, sorted_rows):
+    """Return the path of a generated CSV, creating it if needed."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"{'sorted' if sorted_rows else 'unsorted'}_{rows}.csv"
+    if not path.exists():
+        print(f"generating {path}", file=sys.stderr)
+        generate_csv(path, rows, sorted_rows)
+    return path
+
+
+def compressed_dataset(csv_path):
+    """Return the path of a .qfz copy of a generated CSV, creating it if needed."""
+    path = csv_path.with_name(csv_path.name + ".qfz")
+    if not path.exists():
+        print(f"compressing {csv_path}", file=sys.stderr)
+        compress_csv(csv_path, path)
+    return path
+
+
+def remove_indexes(csv_path):
+    for index in csv_path.parent.glob(csv_path.name + ".*.qfidx"):
+        index.unlink()
+
+
+def latency_stats(samples):
+    """Summarize per-call timings (seconds) in microseconds."""
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_us": round(1e6 * statistics.fmean(samples), 2),
+        "p50_us": round(1e6 * samples[len(samples) // 2], 2),
+        "p90_us": round(1e6 * samples[int(len(samples) * 0.9)], 2),
+        "max_us": round(1e6 * samples[-1], 2),
+    }
+
+
+def time_calls(fn, args):
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_csv(csv_path, rows, sorted_rows, use_index, queries, batch_size):
+    """Time one seeker configuration; returns a result dict."""
+    width = key_width(rows)
+    rng = random.Random(rows)
+    hits = [make_word(2 * rng.randrange(rows), width) for _ in range(queries)]
+    misses = [make_word(2 * rng.randrange(rows) + 1, width) for _ in range(queries)]
+    batch = [make_word(2 * rng.randrange(rows), width) for _ in range(batch_size)]
+
+    remove_indexes(csv_path)
+    start = time.perf_counter()
+    seeker = CSVSeeker(str(csv_path), "word", sorted=sorted_rows, delimiter=",", use_index=use_index)
+    seeker.search(hits[0])  # builds the index on first use
+    open_s = time.perf_counter() - start
+
+    try:
+        hit_samples = time_calls(seeker.search, hits)
+        miss_samples = time_calls(seeker.search, misses)
+        start = time.perf_counter()
+        found = seeker.search_many(batch)
+        batch_s = time.perf_counter() - start
+        assert all(found[w] for w in batch), "batch lookup missed a generated word"
+        assert all(seeker.search(w) for w in hits[:10]), "lookup missed a generated word"
+        memory = seeker.memory_usage()
+    finally:
+        seeker.close()
+
+    return {
+        "name": (f"csv/{'sorted' if sorted_rows else 'unsorted'}/{'index' if use_index else 'noindex'}"
+                 f"{'/qfz' if csv_path.suffix == '.qfz' else ''}/{rows}"),
+        "rows": rows,
+        "file_bytes": csv_path.stat().st_size,
+        "open_first_lookup_s": round(open_s, 4),
+        "hit": latency_stats(hit_samples),
+        "miss": latency_stats(miss_samples),
+        "batch": {"words": batch_size, "total_s": round(batch_s, 4),
+                  "per_word_us": round(1e6 * batch_s / batch_size, 2)},
+        "memory_bytes": memory,
+    }
+
+
+def run_csv_benchmarks(sizes, data_dir, queries, batch_size, scan_limit):
+    results = []
+    for rows in sizes:
+        for sorted_rows in (True, False):
+            csv_path = dataset(data_dir, rows, sorted_rows)
+            for use_index in (True, False):
+                n = queries
+                if not sorted_rows and not use_index:
+                    # Unindexed unsorted lookups are full scans
+                    if rows > scan_limit:
+                        continue
+                    n = max(3, min(queries, scan_limit * 10 // rows))
+                result = bench_csv(csv_path, rows, sorted_rows, use_index, n, batch_size)
+                print(f"{result['name']:<32} hit p50 {result['hit']['p50_us']:>10} us   "
+                      f"miss p50 {result['miss']['p50_us']:>10} us   "
+                      f"batch {result['batch']['per_word_us']:>10} us/word", file=sys.stderr)
+                results.append(result)
+            remove_indexes(csv_path)
+            # Block-compressed copy, indexed (unindexed lookups are scans)
+            qfz_path = compressed_dataset(csv_path)
+            result = bench_csv(qfz_path, rows, sorted_rows, True, queries, batch_size)
+            print(f"{result['name']:<32} hit p50 {result['hit']['p50_us']:>10} us   "
+                  f"miss p50 {result['miss']['p50_us']:>10} us   "
+                  f"batch {result['batch']['per_word_us']:>10} us/word", file=sys.stderr)
+            results.append(result)
+            remove_indexes(qfz_path)
+    return results
+
+
+def run_parse_benchmarks(fixtures_dir, parsers, repeat):
+    # Imported here so CSV-only runs don't need bs4
+    from compare_parsers import fixture_pages
+
+    results = []
+    for source, fetcher, extract, page in fixture_pages(fixtures_dir):
+        html = page.read_text(encoding="utf-8")
+        for parser in parsers:
+            for targeted in (False, True):
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    extract(fetcher, fetcher.make_soup(html, parser, targeted=targeted), page.stem)
+                    samples.append(time.perf_counter() - start)
+                name = f"parse/{source}/{page.stem}/{parser}/{'targeted' if targeted else 'full'}"
+                result = {"name": name, "page_bytes": len(html.encode("utf-8")),
+                          "best_ms": round(1000 * min(samples), 3),
+                          "median_ms": round(1000 * statistics.median(samples), 3)}
+                print(f"{name:<60} best {result['best_ms']:>9} ms", file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+# Timings compared by --compare, as paths into a result entry
+COMPARED = {
+    "csv": [("open_first_lookup_s",), ("hit", "p50_us"), ("miss", "p50_us"), ("batch", "per_word_us")],
+    "parse": [("median_ms",)],
+}
+
+
+def compare(baseline, current, threshold):
+    """Return (name, metric, old, new) for each timing slower by more than threshold."""
+    regressions = []
+    for group, metrics in COMPARED.items():
+        old_by_name = {r["name"]: r for r in baseline.get(group, [])}
+        for result in current.get(group, []):
+            old = old_by_name.get(result["name"])
+            if old is None:
+                continue
+            for path in metrics:
+                old_value, new_value = old, result
+                for step in path:
+                    old_value, new_value = old_value[step], new_value[step]
+                if old_value > 0 and new_value > old_value * (1 + threshold):
+                    regressions.append((result["name"], ".".join(path), old_value, new_value))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", default="10k,100k,1m",
+                    help="comma-separated dictionary sizes, e.g. 10k,100k,1m,10m (default: %(default)s)")
+    ap.add_argument("--queries", type=int, default=1000, help="lookups per hit/miss measurement")
+    ap.add_argument("--batch", type=int, default=100, help="words per search_many batch")
+    ap.add_argument("--scan-limit", type=parse_count, default="1m",
+                    help="largest file to benchmark unindexed unsorted lookups on (full scans)")
+    ap.add_argument("--data-dir", type=Path, default=DATA_DIR, help="where generated CSVs are kept")
+    ap.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="saved HTML fixtures directory")
+    ap.add_argument("--parser", action="append", help="parser(s) for fixture parsing (default: html.parser)")
+    ap.add_argument("--repeat", type=int, default=5, help="parse repetitions per fixture")
+    ap.add_argument("--skip-csv", action="store_true", help="don't run the CSV benchmarks")
+    ap.add_argument("--skip-parse", action="store_true", help="don't run the parsing benchmarks")
+    ap.add_argument("--output", type=Path, help="write results as JSON to this file (default: stdout)")
+    ap.add_argument("--compare", type=Path, metavar="BASELINE", help="report regressions against a previous run")
+    ap.add_argument("--threshold", type=float, default=0.2, help="slowdown reported by --compare (default 0.2 = 20%%)")
+    args = ap.parse_args()
+
+    if not args.skip_parse and not any(args.fixtures.glob("*/*.html")):
+        ap.error(f"no fixtures in {args.fixtures}; save some with compare_parsers.py --save, "
+                 f"or pass --skip-parse")
+
+    results = {"environment": environment(), "csv": [], "parse": []}
+    if not args.skip_csv:
+        sizes = [parse_count(s) for s in args.rows.split(",") if s.strip()]
+        results["csv"] = run_csv_benchmarks(sizes, args.data_dir, args.queries, args.batch, args.scan_limit)
+    if not args.skip_parse:
+        sys.path.insert(0, str(BENCH_DIR))
+        results["parse"] = run_parse_benchmarks(args.fixtures, args.parser or ["html.parser"], args.repeat)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(baseline, results, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new} ({new / old - 1:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
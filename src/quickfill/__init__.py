@@ -15,7 +15,9 @@ __all__ = [
     'fetchers'
 ]
 
-# Check if this is an Anki environment or a testing/dev environment
-if importlib.util.find_spec('aqt'):
+# Check if this is an Anki environment or a testing/dev environment.  Anki
+# imports aqt before loading add-ons; the command line tools (python -m
+# quickfill) run without it even where aqt is installed.
+if importlib.util.find_spec('aqt') and 'aqt' in sys.modules:
     from . import quickfill_addon
     __all__.append('FetcherRegistry')
\ No newline at end of file
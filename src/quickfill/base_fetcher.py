@@ -1,10 +1,55 @@
 from abc import ABC, abstractmethod
 
+from . import http_session
+from .metrics import metrics
+
 class Fetcher(ABC):
     """Abstract base class for QuickFill fetchers."""
+
+    # Results of cacheable fetchers are kept in the persistent response
+    # cache; bump cache_version when a change alters the fetcher's output.
+    cacheable = False
+    cache_version = 0
+
     def __init__(self, message_callback=None):
         self.message_callback = message_callback or (lambda msg: None)
+
+    def http_get(self, url, **kwargs):
+        """
+        GET a URL on the shared keep-alive session.
+
+        Args:
+            url (str): URL to fetch.
+            **kwargs: Passed to requests (headers, params, timeout, ...).
+
+        Returns:
+            requests.Response: The response; raise_for_status() is left to the caller.
+        """
+        with self.timed("network"):
+            return http_session.get(url, **kwargs)
+
+    def timed(self, stage):
+        """
+        Time a block of work as one of this fetcher's metrics stages.
+
+        Usage: `with self.timed("parse"): ...`.  See metrics.py for stages.
+        """
+        return metrics.timer(self.source_name(), stage)
     
+    def suggest(self, word, config, limit=10):
+        """
+        Suggest headwords for a partial or misspelled word.
+
+        Args:
+            word (str): What the user typed.
+            config (dict): Source configuration, as for fetch().
+            limit (int): Maximum number of suggestions.
+
+        Returns:
+            list: Suggested words, best first; empty if unsupported.
+        """
+        return []
+
     @staticmethod
     @abstractmethod
     def source_name(self):
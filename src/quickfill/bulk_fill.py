@@ -0,0 +1,106 @@
+"""
+Bulk QuickFill for the notes selected in the Browser.
+
+Lookups run on a bounded thread pool inside a background operation, and
+the filled notes are written back in batches under a single undo entry.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aqt import mw
+from aqt.operations import CollectionOp, QueryOp
+from aqt.utils import showWarning, tooltip
+
+logger = logging.getLogger(__name__)
+
+# Notes written per update_notes() call
+UPDATE_BATCH_SIZE = 500
+
+
+def bulk_fill(browser, registry, source_for_model, max_workers=4):
+    """
+    Fill every selected note using the source chosen for its note type.
+
+    Args:
+        browser: The aqt Browser whose selection should be filled.
+        registry (FetcherRegistry): Registry used to fetch and apply data.
+        source_for_model (callable): Returns the source config for a note
+            type name, or None if that note type has no sources.
+        max_workers (int): Size of the fetch thread pool.
+    """
+    note_ids = browser.selected_notes()
+    if not note_ids:
+        tooltip("No notes selected")
+        return
+
+    def op(col):
+        jobs = []
+        skipped = 0
+        for nid in note_ids:
+            note = col.get_note(nid)
+            source = source_for_model(note.note_type()["name"])
+            field_idx = source.get("source_field", 0) if source else -1
+            if not source or field_idx >= len(note.fields) or not note.fields[field_idx].strip():
+                skipped += 1
+                continue
+            jobs.append((note, note.fields[field_idx].strip(), source))
+
+        return _fetch_all(registry, jobs, max_workers), skipped
+
+    def on_fetched(result):
+        (filled, failed), skipped = result
+        if not filled:
+            tooltip(f"QuickFill: nothing to update ({failed} not found, {skipped} skipped)")
+            return
+        _update_notes(browser, filled, failed, skipped)
+
+    QueryOp(parent=browser, op=op, success=on_fetched).failure(
+        lambda e: showWarning(f"QuickFill failed:\n{e}")
+    ).with_progress("QuickFill: fetching...").run_in_background()
+
+
+def _fetch_all(registry, jobs, max_workers):
+    """Fetch all jobs on a thread pool; return (filled notes, failure count)."""
+    filled = []
+    failed = 0
+    total = len(jobs)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {
+            executor.submit(registry.fetch_quietly, word, source): note
+            for note, word, source in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            note = futures[future]
+            try:
+                data, _messages = future.result()
+            except Exception as e:
+                logger.warning("QuickFill bulk fetch failed for note %s: %s", note.id, e)
+                data = None
+            if data and registry.apply_data(note, data):
+                filled.append(note)
+            else:
+                failed += 1
+
+            if mw.progress.want_cancel():
+                break
+            mw.taskman.run_on_main(
+                lambda done=done: mw.progress.update(
+                    label=f"QuickFill: fetched {done} of {total}", value=done, max=total)
+            )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return filled, failed
+
+
+def _update_notes(browser, notes, failed, skipped):
+    def op(col):
+        undo_entry = col.add_custom_undo_entry("QuickFill")
+        for start in range(0, len(notes), UPDATE_BATCH_SIZE):
+            col.update_notes(notes[start:start + UPDATE_BATCH_SIZE])
+        return col.merge_undo_entries(undo_entry)
+
+    CollectionOp(parent=browser, op=op).success(
+        lambda _: tooltip(f"QuickFill: filled {len(notes)} notes "
+                          f"({failed} not found, {skipped} skipped)")
+    ).run_in_background()
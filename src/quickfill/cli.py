@@ -0,0 +1,235 @@
+"""
+Fill rows from the command line, without Anki.
+
+Reads words from stdin or a TSV file, looks each one up through a source in
+the add-on's config.json and writes the filled rows to stdout as TSV, ready
+for Anki's importer:
+
+    python -m quickfill deck.tsv --config config.json --model "Basic" > filled.tsv
+    cut -f1 words.tsv | python -m quickfill --config config.json --model "Basic" --source "Cambridge EC"
+
+Each input row is read as a note's fields: the word comes from the source's
+source_field column (or --field) and fetched values go into their mapped
+columns, widening the row as needed.  Only a couple of lookups per worker
+are in flight at a time, so memory stays flat however long the input is.
+Rows come out in input order, or as soon as each one is filled with
+--unordered (a slow lookup then doesn't hold back the rows behind it).
+
+Web sources share the add-on's response cache and offline mirror in
+user_files/ next to the config (--no-cache to bypass both).  Remote audio
+is left as [sound:URL] links, since there is no collection to save it to.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from . import http_session
+from .fetcher import COMBINED, FetcherRegistry
+from .metrics import metrics
+from .mirror import Mirror
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+def load_config(path):
+    """Read the add-on's config.json, or the "config" kept in its meta.json."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return config.get("config", config)
+
+
+def open_registry(config, config_path, cache=True, mirror=True):
+    """
+    Build a FetcherRegistry like the add-on's, minus Anki: HTTP settings from
+    config, and the response cache and mirror in user_files/ next to
+    config_path.
+    """
+    http_session.configure(**config.get("http", {}))
+    user_files = os.path.join(os.path.dirname(os.path.abspath(config_path)), "user_files")
+    response_cache = None
+    cache_config = config.get("cache", {})
+    if cache and cache_config.get("enabled", True):
+        response_cache = ResponseCache(
+            os.path.join(user_files, "response_cache.sqlite3"),
+            max_bytes=cache_config.get("max_size_mb", 64) * 1024 * 1024,
+            default_ttl=cache_config.get("ttl_days", 30) * 86400,
+        )
+    mirror_path = os.path.join(user_files, "mirror.sqlite3")
+    return FetcherRegistry(
+        cache=response_cache,
+        mirror=Mirror(mirror_path) if mirror and os.path.exists(mirror_path) else None,
+    )
+
+
+def select_source(registry, config, model, source=None):
+    """
+    Compile the note type's sources and return the one named source (or
+    the first one).  Config problems are printed as warnings.
+    """
+    models, errors = registry.compile_models(config.get("models", {}))
+    for error in errors:
+        print(f"warning: {error}", file=sys.stderr)
+    plans = models.get(model)
+    if not plans:
+        raise SystemExit(f"No sources for note type '{model}'")
+    plan = next((p for p in plans if source in (None, p.name)), None)
+    if plan is None:
+        raise SystemExit(f"No source named '{source}' for note type '{model}' "
+                         f"(have: {', '.join(p.name for p in plans)})")
+    return plan
+
+
+def row_width(plan):
+    """Number of fields a filled row needs for a plan's mapping."""
+    width = max((idx + 1 for _, idx in plan.fields), default=0)
+    for sub in plan.sources if plan.fetcher == COMBINED else ():
+        width = max(width, row_width(sub))
+    return width
+
+
+def fill_rows(registry, rows, plan, field=None, workers=DEFAULT_WORKERS, ordered=True):
+    """
+    Look rows up in parallel, keeping at most 2 * workers in flight.
+
+    Args:
+        registry (FetcherRegistry): Registry to fetch through.
+        rows (iterable): Lists of field values; read lazily.
+        plan (SourcePlan): The source to use.
+        field (int): Column holding the word (default plan.source_field).
+        workers (int): Lookups run in parallel.
+        ordered (bool): Yield in input order rather than completion order.
+
+    Yields:
+        tuple: (row, data, messages) with fetch_quietly()'s data and
+        messages; rows without a word get ({}, []) and blank lines are
+        skipped.
+    """
+    field = plan.source_field if field is None else field
+    workers = max(1, workers)
+    rows = iter(rows)
+    pending = {}  # Future -> row, in submission order
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quickfill-cli") as executor:
+        def refill():
+            while len(pending) < 2 * workers:
+                row = next(rows, None)
+                if row is None:
+                    return
+                if not row:
+                    continue  # blank line
+                word = row[field].strip() if field < len(row) else ""
+                if word:
+                    future = executor.submit(registry.fetch_quietly, word, plan)
+                else:
+                    future = Future()
+                    future.set_result(({}, []))
+                pending[future] = row
+
+        try:
+            refill()
+            while pending:
+                if ordered:
+                    finished = [next(iter(pending))]
+                else:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    row = pending.pop(future)
+                    try:
+                        data, messages = future.result()
+                    except Exception as e:
+                        data, messages = {}, [str(e)]
+                    yield row, data, messages
+                refill()
+        finally:
+            # Stopped early (e.g. the reader went away): drop queued lookups
+            for future in pending:
+                future.cancel()
+
+
+def apply_row(row, data, width=0):
+    """Return row widened to width with data's {field_idx: value} written in."""
+    filled = list(row)
+    needed = max([width] + [idx + 1 for idx in data if idx >= 0])
+    filled.extend([""] * (needed - len(filled)))
+    for idx, value in data.items():
+        if idx >= 0:
+            filled[idx] = value
+    return filled
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m quickfill",
+        description="Fill TSV rows from a QuickFill source, outside Anki.")
+    ap.add_argument("input", nargs="?", default="-",
+                    help="TSV (or word list) to fill; '-' or omitted reads stdin")
+    ap.add_argument("--config", required=True, help="the add-on's config.json (or meta.json)")
+    ap.add_argument("--model", required=True, help="note type whose source to use")
+    ap.add_argument("--source", help="source name (default: the note type's first source)")
+    ap.add_argument("--field", type=int, help="column holding the word (default: the source's source_field)")
+    ap.add_argument("--delimiter", default="\t", help="input and output delimiter (default: tab)")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="lookups run in parallel")
+    ap.add_argument("--unordered", action="store_true", help="write rows as they are filled, not in input order")
+    ap.add_argument("--only-found", action="store_true", help="leave out rows nothing was found for")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the response cache and offline mirror")
+    ap.add_argument("--metrics", action="store_true", help="print lookup timings to stderr at the end")
+    ap.add_argument("--log-level", default="WARNING", type=str.upper,
+                    choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+                    help="diagnostic logging to stderr (default: WARNING)")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s")
+    delimiter = args.delimiter.encode("utf-8").decode("unicode_escape")
+    config = load_config(args.config)
+    registry = open_registry(config, args.config, cache=not args.no_cache, mirror=not args.no_cache)
+    plan = select_source(registry, config, args.model, args.source)
+    width = row_width(plan)
+
+    if args.input == "-":
+        sys.stdin.reconfigure(encoding="utf-8-sig", newline="")
+        infile = sys.stdin
+    else:
+        infile = open(args.input, "r", encoding="utf-8-sig", newline="")
+    sys.stdout.reconfigure(encoding="utf-8")
+    writer = csv.writer(sys.stdout, delimiter=delimiter, lineterminator="\n")
+
+    counts = {"rows": 0, "found": 0}
+    try:
+        with infile:
+            rows = csv.reader(infile, delimiter=delimiter)
+            for row, data, messages in fill_rows(registry, rows, plan, args.field, args.workers,
+                                                 ordered=not args.unordered):
+                counts["rows"] += 1
+                if data:
+                    counts["found"] += 1
+                else:
+                    for msg in messages:
+                        logger.info("%s", msg)
+                    if args.only_found:
+                        continue
+                writer.writerow(apply_row(row, data, width))
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+    except BrokenPipeError:
+        # The reader (e.g. head) went away; keep Python from complaining on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        for store in (registry.cache, registry.mirror):
+            if store is not None:
+                store.close()
+    print(f"{counts['rows']} rows, {counts['found']} filled from {plan.name}", file=sys.stderr)
+    if args.metrics:
+        print(metrics.format_report(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
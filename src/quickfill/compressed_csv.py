@@ -0,0 +1,266 @@
+"""
+Seekable block-compressed dictionary files (.qfz).
+
+The CSV is cut into blocks of whole lines (about 64 KiB each) that are
+compressed independently, followed by a table of each block's uncompressed
+start and compressed position.  Offsets stay those of the plain CSV, so the
+sidecar indexes work unchanged, and a lookup only decompresses the block
+holding its row.
+
+Layout:
+
+    header      MAGIC, codec id
+    blocks      compressed data, back to back
+    table       (uncompressed start, file offset) per block, uint64 pairs,
+                plus a final (uncompressed size, table offset) pair
+    footer      table offset, block count, MAGIC
+
+Blocks are zlib-compressed by default; zstd is used if asked for and the
+zstandard module is installed.
+
+Command line:
+
+    python -m quickfill.compressed_csv ecdict.csv --codec zlib --block-size 64
+"""
+import argparse
+import array
+import bisect
+import io
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+MAGIC = b"QFZBLK01"
+SUFFIX = ".qfz"
+CODECS = ("zlib", "zstd")
+DEFAULT_BLOCK_SIZE = 64 * 1024
+DEFAULT_LEVEL = {"zlib": 6, "zstd": 10}
+# Decompressed blocks kept per open file
+CACHED_BLOCKS = 8
+
+_HEADER = struct.Struct("<8sB7x")    # magic, codec id
+_FOOTER = struct.Struct("<QQ8s")     # table offset, block count, magic
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd-compressed dictionaries need the zstandard module "
+                         "(pip install zstandard)") from None
+    return zstandard
+
+
+def _compressor(codec, level):
+    if codec == "zlib":
+        return lambda data: zlib.compress(data, level)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=level).compress
+    raise ValueError(f"Unknown codec '{codec}' (expected one of {', '.join(CODECS)})")
+
+
+def _decompressor(codec):
+    if codec == "zlib":
+        return zlib.decompress
+    return _zstd().ZstdDecompressor().decompress
+
+
+def is_compressed(path):
+    """True if path is a block-compressed dictionary (judged by its magic, not its name)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def open_source(path):
+    """Open a dictionary for binary reading, whether plain or block-compressed."""
+    if is_compressed(path):
+        return BlockFile(path)
+    return open(path, "rb")
+
+
+class BlockFile(io.RawIOBase):
+    """
+    Read-only binary file over a .qfz container, seekable at the offsets of
+    the uncompressed CSV.  Recently used blocks are kept decompressed.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = Path(path)
+        self._f = open(self.path, "rb")
+        try:
+            magic, codec_id = _HEADER.unpack(self._f.read(_HEADER.size))
+            self._f.seek(-_FOOTER.size, os.SEEK_END)
+            table_offset, count, end_magic = _FOOTER.unpack(self._f.read(_FOOTER.size))
+            if magic != MAGIC or end_magic != MAGIC or codec_id >= len(CODECS):
+                raise ValueError(f"{self.path} is not a QuickFill compressed dictionary")
+            self.codec = CODECS[codec_id]
+            self._decompress = _decompressor(self.codec)
+            self._f.seek(table_offset)
+            table = array.array("Q")
+            table.frombytes(self._f.read(16 * (count + 1)))
+            if sys.byteorder != "little":
+                table.byteswap()
+        except (struct.error, OSError, ValueError):
+            self._f.close()
+            raise
+        self._starts = table[0::2]      # uncompressed start of each block, then the total size
+        self._offsets = table[1::2]     # file offset of each block, then the table offset
+        self.size = self._starts[-1]
+        self._blocks = OrderedDict()
+        self._pos = 0
+
+    def _block(self, i):
+        data = self._blocks.get(i)
+        if data is None:
+            self._f.seek(self._offsets[i])
+            data = self._decompress(self._f.read(self._offsets[i + 1] - self._offsets[i]))
+            self._blocks[i] = data
+            if len(self._blocks) > CACHED_BLOCKS:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(i)
+        return data
+
+    def _locate(self):
+        """Return (block number, position in it) for the current offset."""
+        i = bisect.bisect_right(self._starts, self._pos) - 1
+        return i, self._pos - self._starts[i]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def readinto(self, b):
+        if self._pos >= self.size:
+            return 0
+        i, start = self._locate()
+        chunk = self._block(i)[start:start + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def readline(self, size=-1):
+        # Blocks end on line boundaries, so a line never spans two of them
+        if self._pos >= self.size:
+            return b""
+        i, start = self._locate()
+        block = self._block(i)
+        end = block.find(b"\n", start)
+        end = len(block) if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, start + size)
+        self._pos += end - start
+        return block[start:end]
+
+    def read(self, size=-1):
+        if size is not None and size >= 0:
+            return super().read(size)
+        parts = []
+        while self._pos < self.size:
+            i, start = self._locate()
+            chunk = self._block(i)[start:]
+            parts.append(chunk)
+            self._pos += len(chunk)
+        return b"".join(parts)
+
+    readall = read
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+            self._blocks.clear()
+        super().close()
+
+
+def compress_csv(csv_path, out_path=None, codec="zlib", block_size=DEFAULT_BLOCK_SIZE,
+                 level=None, progress=None):
+    """
+    Write a block-compressed copy of a CSV dictionary.
+
+    Args:
+        csv_path (str): Plain CSV file.
+        out_path (str): Output file; defaults to <csv>.qfz next to the CSV.
+        codec (str): "zlib" or "zstd".
+        block_size (int): Uncompressed bytes per block (rounded up to whole lines).
+        level (int): Compression level; defaults to DEFAULT_LEVEL[codec].
+        progress (callable): Called as progress(bytes_done, bytes_total).
+
+    Returns:
+        tuple: (out_path, uncompressed size, compressed size)
+    """
+    csv_path = Path(csv_path).expanduser()
+    out_path = Path(out_path).expanduser() if out_path else csv_path.with_name(csv_path.name + SUFFIX)
+    compress = _compressor(codec, DEFAULT_LEVEL[codec] if level is None else level)
+    total = os.path.getsize(csv_path)
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+
+    table = array.array("Q")
+    with open(csv_path, "rb") as src, open(tmp_path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, CODECS.index(codec)))
+        done = 0
+        while True:
+            chunk = src.read(block_size)
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                chunk += src.readline()
+            table.extend((done, out.tell()))
+            out.write(compress(chunk))
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+        table_offset = out.tell()
+        table.extend((done, table_offset))
+        if sys.byteorder != "little":
+            table.byteswap()
+        out.write(table.tobytes())
+        out.write(_FOOTER.pack(table_offset, len(table) // 2 - 1, MAGIC))
+    os.replace(tmp_path, out_path)
+    return str(out_path), done, os.path.getsize(out_path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compress a CSV dictionary into a seekable .qfz file.")
+    ap.add_argument("csv_path", help="plain CSV dictionary")
+    ap.add_argument("-o", "--output", help="output file (default: <csv>.qfz)")
+    ap.add_argument("--codec", choices=CODECS, default="zlib")
+    ap.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE // 1024, metavar="KB",
+                    help="uncompressed block size in KiB (default: %(default)s)")
+    ap.add_argument("--level", type=int, help="compression level")
+    args = ap.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{100 * done // max(total, 1)}%", end="", file=sys.stderr)
+
+    out_path, size, compressed = compress_csv(args.csv_path, args.output, codec=args.codec,
+                                              block_size=args.block_size * 1024, level=args.level,
+                                              progress=progress)
+    print(f"\nWrote {out_path}: {size} -> {compressed} bytes "
+          f"({100 * compressed // max(size, 1)}%)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,591 @@
+"""
+Persistent sidecar indexes for CSVSeeker.
+
+An index is written next to the CSV it describes and is stamped with that
+file's size and mtime, so it is rebuilt automatically when the dictionary
+changes.  Index files are memory-mapped; if one can't be written (read-only
+dictionary folder, etc.) the freshly built index is simply kept in memory.
+"""
+import array
+import csv
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+from .compressed_csv import open_source
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QFIDX001"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sI")   # magic, length of the JSON meta block
+_ALIGN = 8
+
+
+def file_stamp(path):
+    """Return the (size, mtime_ns) pair an index is keyed on."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def normalize_key(value):
+    """Return the byte form of a key as it is stored in an index."""
+    return value.lower().encode("utf-8")
+
+
+def parse_line(line, delimiter):
+    """Parse one raw CSV line (bytes) into a list of column values."""
+    text = line.decode("utf-8", "replace")
+    try:
+        return next(csv.reader([text], delimiter=delimiter))
+    except (csv.Error, StopIteration):
+        return []
+
+
+def extract_field(line, idx, delimiter):
+    """
+    Return column idx of a raw CSV line as bytes, without decoding the line.
+
+    Lines containing quotes fall back to the csv module so quoted
+    delimiters are handled the same way as a full parse.
+    """
+    line = line.rstrip(b"\r\n")
+    if b'"' in line:
+        row = parse_line(line, delimiter)
+        return row[idx].encode("utf-8") if idx < len(row) else b""
+    parts = line.split(delimiter.encode("utf-8"), idx + 1)
+    return parts[idx] if idx < len(parts) else b""
+
+
+def normalize_field(raw):
+    """normalize_key() for a raw UTF-8 field, skipping the decode for ASCII."""
+    if raw.isascii():
+        return raw.lower()
+    return raw.decode("utf-8", "replace").lower().encode("utf-8")
+
+
+def iter_records(csv_path, key_idx, delimiter):
+    """
+    Stream the data rows of a CSV file.
+
+    Yields:
+        tuple: (row_offset, key) where row_offset is the byte offset of the
+        row and key is the raw bytes of column key_idx.
+    """
+    with open_source(csv_path) as f:
+        offset = len(f.readline())  # skip header
+        for line in f:
+            row_offset = offset
+            offset += len(line)
+            key = extract_field(line, key_idx, delimiter)
+            if key:
+                yield row_offset, key
+
+
+def iter_buffer_records(buf, key_idx, delimiter):
+    """iter_records() for a CSV file already read into memory."""
+    pos = buf.find(b"\n") + 1 or len(buf)  # skip header
+    size = len(buf)
+    while pos < size:
+        end = buf.find(b"\n", pos)
+        if end < 0:
+            end = size
+        key = extract_field(buf[pos:end], key_idx, delimiter)
+        if key:
+            yield pos, key
+        pos = end + 1
+
+
+def _pad(n):
+    return -n % _ALIGN
+
+
+class SidecarIndex:
+    """
+    Base class for the on-disk indexes.
+
+    Layout: fixed header, JSON meta block, then a number of 8-byte aligned
+    binary sections whose (offset, length) pairs are recorded in the meta.
+    Subclasses provide `kind`, `_build_sections` and `_attach`.
+    """
+    kind = None
+
+    def __init__(self, buf, meta, path=None):
+        self._buf = buf
+        self.meta = meta
+        self.path = path
+        self._views = []
+        self._attach()
+
+    # ------------------------------------------------------------------ #
+    # Construction
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def index_path(cls, csv_path, field):
+        csv_path = Path(csv_path)
+        safe_field = re.sub(r"[^\w.-]", "_", field)
+        return csv_path.with_name(f"{csv_path.name}.{safe_field}.{cls.kind}.qfidx")
+
+    @classmethod
+    def open(cls, csv_path, field, key_idx, delimiter):
+        """
+        Return an index for csv_path, loading the sidecar if it is current
+        and (re)building it otherwise.
+        """
+        path = cls.index_path(csv_path, field)
+        expected = cls._expected_meta(csv_path, field, delimiter)
+        index = cls.load(path, expected)
+        if index is not None:
+            return index
+
+        logger.debug("Building %s index for %s", cls.kind, csv_path)
+        blob = cls.build(csv_path, key_idx, expected)
+        try:
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write index %s, keeping it in memory: %s", path, e)
+            return cls(blob, cls._read_meta(blob))
+        return cls.load(path, expected) or cls(blob, cls._read_meta(blob))
+
+    @classmethod
+    def from_records(cls, records, meta):
+        """Build an index that lives only in memory from (row_offset, key) pairs."""
+        meta = dict(meta)
+        sections = cls._build_sections(records, meta)
+        blob = cls._serialize(meta, sections)
+        return cls(blob, cls._read_meta(blob))
+
+    @classmethod
+    def _expected_meta(cls, csv_path, field, delimiter):
+        return {
+            "version": VERSION,
+            "kind": cls.kind,
+            "byteorder": sys.byteorder,
+            "stamp": file_stamp(csv_path),
+            "field": field,
+            "delimiter": delimiter,
+        }
+
+    @classmethod
+    def load(cls, path, expected):
+        """Memory-map an existing index; return None if missing or stale."""
+        try:
+            with open(path, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            meta = cls._read_meta(buf)
+        except ValueError:
+            meta = None
+        if not meta or any(meta.get(k) != v for k, v in expected.items()):
+            buf.close()
+            return None
+        return cls(buf, meta, path)
+
+    @staticmethod
+    def _read_meta(buf):
+        if len(buf) < _HEADER.size:
+            raise ValueError("index too short")
+        magic, meta_len = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError("bad index magic")
+        start = _HEADER.size
+        return json.loads(bytes(buf[start:start + meta_len]).decode("utf-8"))
+
+    @classmethod
+    def build(cls, csv_path, key_idx, meta):
+        """Stream the CSV and return the serialized index as bytes."""
+        sections = cls._build_sections(iter_records(csv_path, key_idx, meta["delimiter"]), meta)
+        return cls._serialize(meta, sections)
+
+    @classmethod
+    def _serialize(cls, meta, sections):
+        meta = dict(meta)
+        # Section offsets depend on the meta length, which in turn depends on
+        # the offsets; iterate until the layout is stable.
+        meta["sections"] = [[0, len(s)] for s in sections]
+        while True:
+            meta_bytes = json.dumps(meta).encode("utf-8")
+            pos = _HEADER.size + len(meta_bytes)
+            pos += _pad(pos)
+            layout = []
+            for s in sections:
+                layout.append([pos, len(s)])
+                pos += len(s) + _pad(len(s))
+            if layout == meta["sections"]:
+                break
+            meta["sections"] = layout
+
+        out = bytearray(_HEADER.pack(MAGIC, len(meta_bytes)))
+        out += meta_bytes
+        for s in sections:
+            out += b"\0" * _pad(len(out))
+            out += s
+        return bytes(out)
+
+    @classmethod
+    def _build_sections(cls, records, meta):
+        raise NotImplementedError
+
+    # ------------------------------------------------------------------ #
+    # Access
+    # ------------------------------------------------------------------ #
+    def _section(self, i, fmt=None):
+        """Return section i as a memoryview, optionally cast to fmt."""
+        offset, length = self.meta["sections"][i]
+        view = memoryview(self._buf)[offset:offset + length]
+        if fmt:
+            view = view.cast(fmt)
+        self._views.append(view)
+        return view
+
+    def _attach(self):
+        raise NotImplementedError
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    @property
+    def nbytes(self):
+        return len(self._buf)
+
+    def __len__(self):
+        return self.meta.get("count", 0)
+
+
+class SortedOffsetIndex(SidecarIndex):
+    """
+    Sorted (lowercased key -> row offset) index.
+
+    Sections: key end offsets (uint64, count + 1), row offsets (uint64,
+    count) and the concatenated UTF-8 key blob.  Lookups are a bisect over
+    the key blob followed by reading the matching rows from the CSV.
+    """
+    kind = "sorted"
+
+    @classmethod
+    def _build_sections(cls, records, meta):
+        key_ends = array.array("Q", [0])
+        row_offsets = array.array("Q")
+        blob = bytearray()
+        in_order = True
+        prev = b""
+        for row_offset, key in records:
+            key = normalize_field(key)
+            if key < prev:
+                in_order = False
+            prev = key
+            blob += key
+            key_ends.append(len(blob))
+            row_offsets.append(row_offset)
+
+        if not in_order:
+            # Stable sort keeps duplicate headwords in file order.
+            order = sorted(range(len(row_offsets)),
+                           key=lambda i: blob[key_ends[i]:key_ends[i + 1]])
+            sorted_ends = array.array("Q", [0])
+            sorted_offsets = array.array("Q")
+            sorted_blob = bytearray()
+            for i in order:
+                sorted_blob += blob[key_ends[i]:key_ends[i + 1]]
+                sorted_ends.append(len(sorted_blob))
+                sorted_offsets.append(row_offsets[i])
+            key_ends, row_offsets, blob = sorted_ends, sorted_offsets, sorted_blob
+
+        meta["count"] = len(row_offsets)
+        return [key_ends.tobytes(), row_offsets.tobytes(), bytes(blob)]
+
+    def _attach(self):
+        self._key_ends = self._section(0, "Q")
+        self._row_offsets = self._section(1, "Q")
+        self._keys_start = self.meta["sections"][2][0]
+        self.count = self.meta["count"]
+
+    def key_at(self, i):
+        """Return the normalized key stored at position i."""
+        base = self._keys_start
+        return self._buf[base + self._key_ends[i]:base + self._key_ends[i + 1]]
+
+    def bisect_left(self, key, lo=0, hi=None):
+        hi = self.count if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, key, lo=0, hi=None):
+        """
+        Return the row offsets stored under the normalized key.  lo/hi
+        bound where its first entry may be, if already known.
+        """
+        i = self.bisect_left(key, lo, hi)
+        offsets = []
+        while i < self.count and self.key_at(i) == key:
+            offsets.append(self._row_offsets[i])
+            i += 1
+        return offsets
+
+    def prefix_keys(self, prefix, limit):
+        """Return up to limit distinct keys starting with prefix, in order."""
+        keys = []
+        i = self.bisect_left(prefix)
+        while i < self.count and len(keys) < limit:
+            key = bytes(self.key_at(i))
+            if not key.startswith(prefix):
+                break
+            if not keys or keys[-1] != key:
+                keys.append(key)
+            i += 1
+        return keys
+
+
+def key_hash(key):
+    """Stable 32-bit hash of a normalized key (Python's hash() is salted)."""
+    return zlib.crc32(key)
+
+
+class HashOffsetIndex(SidecarIndex):
+    """
+    Hash (lowercased key -> row offsets) index for unsorted files.
+
+    Sections: bucket start positions (uint64, buckets + 1), then the key
+    hashes (uint32) and row offsets (uint64) grouped by bucket.  A lookup
+    touches a single bucket, so it costs the same however the CSV is
+    ordered.  Hash collisions are possible; callers verify the row key.
+    """
+    kind = "hash"
+
+    @classmethod
+    def _build_sections(cls, records, meta):
+        hashes = array.array("I")
+        row_offsets = array.array("Q")
+        for row_offset, key in records:
+            for variant in cls._keys_for(key):
+                hashes.append(key_hash(variant))
+                row_offsets.append(row_offset)
+
+        count = len(row_offsets)
+        buckets = 1
+        while buckets < count:
+            buckets <<= 1
+        mask = buckets - 1
+
+        # Counting sort by bucket, keeping file order within a bucket.
+        starts = array.array("Q", bytes(8 * (buckets + 1)))
+        for h in hashes:
+            starts[(h & mask) + 1] += 1
+        for b in range(buckets):
+            starts[b + 1] += starts[b]
+        fill = array.array("Q", starts[:-1])
+        sorted_hashes = array.array("I", bytes(4 * count))
+        sorted_offsets = array.array("Q", bytes(8 * count))
+        for h, row_offset in zip(hashes, row_offsets):
+            b = h & mask
+            pos = fill[b]
+            sorted_hashes[pos] = h
+            sorted_offsets[pos] = row_offset
+            fill[b] = pos + 1
+
+        meta["count"] = count
+        meta["buckets"] = buckets
+        return [starts.tobytes(), sorted_hashes.tobytes(), sorted_offsets.tobytes()]
+
+    @staticmethod
+    def _keys_for(key):
+        """Return the normalized keys a row is filed under."""
+        return (normalize_field(key),)
+
+    def _attach(self):
+        self._starts = self._section(0, "Q")
+        self._hashes = self._section(1, "I")
+        self._row_offsets = self._section(2, "Q")
+        self._mask = self.meta["buckets"] - 1
+        self.count = self.meta["count"]
+
+    def lookup(self, key):
+        """Return candidate row offsets for the normalized key."""
+        h = key_hash(key)
+        b = h & self._mask
+        return [self._row_offsets[i]
+                for i in range(self._starts[b], self._starts[b + 1])
+                if self._hashes[i] == h]
+
+
+def lemma_variants(raw):
+    """
+    Return the inflected forms listed in a raw variants field, such as
+    ECDICT's exchange column ("p:ran/d:run/i:running/3:runs").  Types 0 and 1
+    describe the word's own lemma rather than its forms and are skipped;
+    items without a type are taken as forms, so plain "/" lists work too.
+    """
+    forms = []
+    for item in raw.split(b"/"):
+        kind, sep, form = item.partition(b":")
+        if not sep:
+            form = kind
+        elif kind.strip() in (b"0", b"1"):
+            continue
+        form = form.strip()
+        if form:
+            forms.append(form)
+    return forms
+
+
+class LemmaIndex(HashOffsetIndex):
+    """
+    Inverted (inflected form -> headword row offsets) index over a variants
+    column, so "geese" finds the row for "goose".  Same layout as
+    HashOffsetIndex, with each row filed under every form it lists.
+    """
+    kind = "lemma"
+
+    @staticmethod
+    def _keys_for(key):
+        return {normalize_field(form) for form in lemma_variants(key)}
+
+
+def trigrams(word):
+    """
+    Return the distinct character trigrams of a word, padded so its first and
+    last letters count too.  One edit changes at most three of them.
+    """
+    padded = f"\x02{word}\x03"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return min(prev[-1], limit + 1)
+
+
+class TrigramIndex(SidecarIndex):
+    """
+    Trigram (n-gram) index of the distinct lowercased keys, for fuzzy search.
+
+    Sections: key end offsets (uint64, count + 1) and the sorted key blob,
+    then bucket starts (uint64, buckets + 1) and trigram hashes (uint32) and
+    key ids (uint32) grouped by bucket, as in HashOffsetIndex.  A search
+    collects keys sharing the query's rarest trigrams and ranks them by
+    bounded edit distance.
+    """
+    kind = "trigram"
+
+    # Most candidates verified with bounded_distance() per search
+    MAX_CANDIDATES = 5000
+
+    @classmethod
+    def _build_sections(cls, records, meta):
+        keys = sorted({normalize_field(key) for _, key in records})
+        key_ends = array.array("Q", [0])
+        blob = bytearray()
+        hashes = array.array("I")
+        ids = array.array("I")
+        for key_id, key in enumerate(keys):
+            blob += key
+            key_ends.append(len(blob))
+            for gram in trigrams(key.decode("utf-8", "replace")):
+                hashes.append(key_hash(gram.encode("utf-8")))
+                ids.append(key_id)
+        del keys
+
+        distinct = len(set(hashes))
+        buckets = 1
+        while buckets < distinct:
+            buckets <<= 1
+        mask = buckets - 1
+
+        starts = array.array("Q", bytes(8 * (buckets + 1)))
+        for h in hashes:
+            starts[(h & mask) + 1] += 1
+        for b in range(buckets):
+            starts[b + 1] += starts[b]
+        fill = array.array("Q", starts[:-1])
+        sorted_hashes = array.array("I", bytes(4 * len(hashes)))
+        sorted_ids = array.array("I", bytes(4 * len(ids)))
+        for h, key_id in zip(hashes, ids):
+            b = h & mask
+            pos = fill[b]
+            sorted_hashes[pos] = h
+            sorted_ids[pos] = key_id
+            fill[b] = pos + 1
+
+        meta["count"] = len(key_ends) - 1
+        meta["buckets"] = buckets
+        return [key_ends.tobytes(), bytes(blob), starts.tobytes(),
+                sorted_hashes.tobytes(), sorted_ids.tobytes()]
+
+    def _attach(self):
+        self._key_ends = self._section(0, "Q")
+        self._keys_start = self.meta["sections"][1][0]
+        self._starts = self._section(2, "Q")
+        self._hashes = self._section(3, "I")
+        self._ids = self._section(4, "I")
+        self._mask = self.meta["buckets"] - 1
+        self.count = self.meta["count"]
+
+    def key_at(self, i):
+        base = self._keys_start
+        return self._buf[base + self._key_ends[i]:base + self._key_ends[i + 1]]
+
+    def _postings(self, gram):
+        h = key_hash(gram.encode("utf-8"))
+        b = h & self._mask
+        return [self._ids[i] for i in range(self._starts[b], self._starts[b + 1])
+                if self._hashes[i] == h]
+
+    def search(self, word, max_distance=2, limit=10):
+        """
+        Return up to limit (distance, key) pairs for keys within max_distance
+        edits of word (a normalized str), closest first.
+        """
+        grams = trigrams(word)
+        # A key within k edits shares all but 3k of the query's trigrams, so
+        # it must contain one of any 3k + 1 of them: use the rarest.
+        by_rarity = sorted(grams, key=lambda g: self._bucket_size(g))
+        shared = {}
+        for gram in by_rarity[:3 * max_distance + 1]:
+            for key_id in self._postings(gram):
+                shared[key_id] = shared.get(key_id, 0) + 1
+
+        candidates = sorted(shared, key=lambda k: -shared[k])[:self.MAX_CANDIDATES]
+        found = []
+        for key_id in candidates:
+            key = bytes(self.key_at(key_id))
+            text = key.decode("utf-8", "replace")
+            distance = bounded_distance(word, text, max_distance)
+            if distance <= max_distance:
+                found.append((distance, -shared[key_id], key))
+        found.sort()
+        return [(distance, key) for distance, _, key in found[:limit]]
+
+    def _bucket_size(self, gram):
+        b = key_hash(gram.encode("utf-8")) & self._mask
+        return self._starts[b + 1] - self._starts[b]
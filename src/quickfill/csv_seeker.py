@@ -1,18 +1,35 @@
 import csv
+import io
+import logging
+import mmap
 import os
+import threading
 from pathlib import Path
 
 from io import StringIO
 
 from typing import List, Dict, Any
 
+from .compressed_csv import is_compressed, open_source
+from .csv_index import (HashOffsetIndex, LemmaIndex, SortedOffsetIndex, TrigramIndex,
+                        extract_field, file_stamp, lemma_variants, normalize_field,
+                        normalize_key, parse_line)
+
+logger = logging.getLogger(__name__)
+
+# Without an index, a batch costs ~log2(size) line probes per word when
+# bisected and ~size / row length line reads when merged in one pass.  Merge
+# once the former exceeds the latter, assuming rows of about this many bytes.
+MERGE_PASS_FACTOR = 100
+
+
 def dict_from_record(record_str, fieldnames, delimiter='\t'):
     """Convert a record string to a dictionary using fieldnames."""
     try:
         stream = StringIO(record_str)
         return next(csv.DictReader(stream, fieldnames, delimiter=delimiter))
     except (csv.Error, IndexError) as e:
-        print(f"Debug: Error parsing record '{record_str}': {str(e)}")
+        logger.debug("Error parsing record '%s': %s", record_str, e)
         return {}
 
 
@@ -22,101 +39,351 @@ class CSVSeeker:
     Works with any delimiter, sorted/unsorted, and custom search column.
     """
 
-    def __init__(self, csv_path, search_field, sorted=True, delimiter="\t"):
+    def __init__(self, csv_path, search_field, sorted=True, delimiter="\t", use_index=True):
         self.csv_path = Path(csv_path).expanduser()
         self.sorted = sorted
         self.delimiter = delimiter
         self.search_field = search_field
+        self.use_index = use_index
+        self._indexes = {}
+        self._building = set()  # index keys being built in the background
+        self._closed = False
+        self._fh = None
+        self._mm = None
+        self._lock = threading.RLock()
 
         if not self.csv_path.is_file():
             raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
 
+        # (size, mtime) at open time; indexes and handles are only valid for it
+        self.stamp = file_stamp(self.csv_path)
+        # Block-compressed (.qfz) dictionaries are read through open_source()
+        self.compressed = is_compressed(self.csv_path)
+
         # Read header once
         self.header = self._get_csv_header()
 
     def _get_csv_header(self, encoding: str = "utf-8") -> List[str]:
         """Read the first line and split by delimiter."""
         try:
-            with open(self.csv_path, "r", encoding=encoding) as f:
+            with io.TextIOWrapper(open_source(self.csv_path), encoding=encoding) as f:
                 line = f.readline().strip()
                 header = line.split(self.delimiter)
-            print(f"Debug: Header (delimiter='{self.delimiter}'): {header}")
+            logger.debug("Header (delimiter='%s'): %s", self.delimiter, header)
             return header
         except UnicodeDecodeError:
-            print("Debug: Trying utf-8-sig for BOM...")
-            with open(self.csv_path, "r", encoding="utf-8-sig") as f:
+            logger.debug("Trying utf-8-sig for BOM...")
+            with io.TextIOWrapper(open_source(self.csv_path), encoding="utf-8-sig") as f:
                 line = f.readline().strip()
                 header = line.split(self.delimiter)
-            print(f"Debug: Header (utf-8-sig): {header}")
+            logger.debug("Header (utf-8-sig): %s", header)
             return header
 
+    def _get_index(self, index_cls, field=None, background=False):
+        """
+        Open (building if needed) a sidecar index of the given class over
+        field (default: the search field), or None.
+
+        With background=True a missing or outdated sidecar is built on a
+        background thread instead, and None is returned until it is ready.
+        """
+        field = field or self.search_field
+        key = (index_cls.kind, field)
+        with self._lock:
+            if key not in self._indexes and self.use_index:
+                if field != self.search_field and field not in self.header:
+                    logger.warning("Field '%s' not in header of %s", field, self.csv_path)
+                    return None
+                try:
+                    key_idx = self.header.index(field)
+                    if background:
+                        index = index_cls.load(index_cls.index_path(self.csv_path, field),
+                                               index_cls._expected_meta(self.csv_path, field, self.delimiter))
+                        if index is None:
+                            self._build_later(index_cls, field, key_idx)
+                            return None
+                        self._indexes[key] = index
+                    else:
+                        self._indexes[key] = index_cls.open(self.csv_path, field, key_idx, self.delimiter)
+                except (OSError, ValueError) as e:
+                    logger.warning("%s index unavailable for %s: %s", index_cls.kind, self.csv_path, e)
+                    self.use_index = False
+            return self._indexes.get(key)
+
+    def _build_later(self, index_cls, field, key_idx):
+        """Build an index on a background thread (once), then adopt it."""
+        key = (index_cls.kind, field)
+        if key in self._building:
+            return
+        self._building.add(key)
+
+        def build():
+            try:
+                index = index_cls.open(self.csv_path, field, key_idx, self.delimiter)
+            except (OSError, ValueError) as e:
+                logger.warning("%s index unavailable for %s: %s", index_cls.kind, self.csv_path, e)
+                index = None
+            except BaseException:
+                logger.exception("Building the %s index for %s failed", index_cls.kind, self.csv_path)
+                index = None
+            with self._lock:
+                self._building.discard(key)
+                if index is None:
+                    self.use_index = False
+                elif self._closed:
+                    index.close()
+                else:
+                    self._indexes[key] = index
+
+        threading.Thread(target=build, name="quickfill-index", daemon=True).start()
+
+    def _read_rows(self, offsets, wanted, results):
+        """
+        Read the rows at the given byte offsets, appending each to
+        results[word] when its key is one of the wanted words.
+        """
+        key_idx = self.header.index(self.search_field)
+        with self._lock:
+            if self._fh is None:
+                self._fh = open_source(self.csv_path)
+            for offset in sorted(offsets):
+                self._fh.seek(offset)
+                row = parse_line(self._fh.readline(), self.delimiter)
+                if key_idx < len(row) and row[key_idx] in wanted:
+                    results[row[key_idx]].append(row)
+
+    def _scan(self, wanted, results):
+        """Linear scan for unsorted files when no index is available."""
+        key_idx = self.header.index(self.search_field)
+        wanted_bytes = {w.encode('utf-8'): w for w in wanted}
+        with open_source(self.csv_path) as f:
+            f.readline()  # skip header
+            for line in f:
+                word = wanted_bytes.get(extract_field(line, key_idx, self.delimiter))
+                if word is not None:
+                    results[word].append(parse_line(line, self.delimiter))
+
+    def is_stale(self):
+        """True if the CSV changed (or vanished) since this seeker opened it."""
+        try:
+            return file_stamp(self.csv_path) != self.stamp
+        except OSError:
+            return True
+
+    def memory_usage(self):
+        """Approximate bytes held by this seeker's open indexes."""
+        # A copy: the background index thread may add to _indexes meanwhile
+        return sum(index.nbytes for index in list(self._indexes.values()))
+
+    def close(self):
+        """Release any memory-mapped indexes and the open CSV handle/mapping."""
+        with self._lock:
+            self._closed = True
+            for index in self._indexes.values():
+                index.close()
+            self._indexes = {}
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+
     def search(self, word: str) -> List[Dict[str, str]]:
-        #def get_matching_rows_mine(file_path, word, source_field_name, csv_sorted=False, encoding='utf-8'):
-        size = os.path.getsize(self.csv_path)
-
-        word_lower = word.lower()
-        data = []
-        
-        # Get header
-        if not self.header:
-            print(f"Error: Search field '{search_field}' not in header.")
-            return []
+        return self.search_many([word])[word]
 
-        source_idx = self.header.index(self.search_field)
+    def search_many(self, words) -> Dict[str, List[List[str]]]:
+        """
+        Look up many words in one pass.
 
-        with open(self.csv_path, 'rt', encoding='utf-8') as f:
-            # Skip header
-            f.readline()
+        Keys are grouped and sorted once, then resolved with narrowing
+        bisect bounds over the index or file; very large batches against an
+        unindexed sorted file are resolved by a single forward merge pass.
 
-            low = f.tell()
-            high = size - 1
+        Returns:
+            dict: word -> list of matching rows (empty list for misses).
+        """
+        results = {word: [] for word in words}
+        if not results:
+            return results
 
+        index = self._get_index(SortedOffsetIndex if self.sorted else HashOffsetIndex)
+        if index is not None:
+            offsets = []
             if self.sorted:
-                while low < high: # while we are still searching
-
-                    approx_mid = (low + high) // 2
-                    mid = approx_mid
-
-                    if mid > low:
-                        while True:
-                            try:
-                                f.seek(mid)
-                                f.readline() # skip forward to the next line
-                            except UnicodeDecodeError:
-                                mid += 1
-                                continue
-                            break
-
-                        # Get the first /NEW/ word that occurs strictly after approx_mid
-                        prev_word = None
-                        cur_word = None
-                        while not prev_word or cur_word == prev_word:
-                            mid = f.tell()
-                            line = f.readline()
-                            prev_word = cur_word
-                            cur_word = dict_from_record(line, self.header, self.delimiter).get(self.search_field, '').lower()
-                    else: # mid == low, so this is the start of a new word
-                        f.seek(mid)
-                        line = f.readline()
-                        cur_word = dict_from_record(line, self.header, self.delimiter).get(self.search_field, '').lower()
-
-                    # Now we know that next_word starts AT mid
-                    if cur_word and cur_word < word_lower and low < mid:
-                        low = mid
-                    else:
-                        high = approx_mid # in case we skipped over it
+                low = 0
+                for target in sorted({normalize_key(w) for w in results}):
+                    low = index.bisect_left(target, low)
+                    offsets.extend(index.lookup(target, low))
+            else:
+                for target in {normalize_key(w) for w in results}:
+                    offsets.extend(index.lookup(target))
+            self._read_rows(offsets, results, results)
+        elif not self.sorted or self.compressed:
+            # Compressed files can't be bisected without an index
+            self._scan(results, results)
+        elif self.header and self.search_field in self.header and self.stamp[0]:
+            groups = {}
+            for word in results:
+                groups.setdefault(normalize_key(word), {})[word.encode('utf-8')] = word
+            with self._lock:
+                mm = self._mapped()
+                if len(groups) * len(mm).bit_length() * MERGE_PASS_FACTOR > len(mm):
+                    self._merge(mm, groups, results)
+                else:
+                    self._bisect(mm, groups, results)
+        else:
+            logger.warning("Search field '%s' not in header.", self.search_field)
+        return results
+
+    def search_lemma(self, word, field):
+        """
+        Return the rows that list word as an inflected form in the variants
+        column field (see LemmaIndex), e.g. the "run" row for "running".
+        Needs the sidecar indexes; returns an empty list when indexing is off.
+        """
+        target = normalize_key(word.strip())
+        index = self._lemma_index(field)
+        if not target or index is None:
+            return []
+        field_idx = self.header.index(field)
+        rows = []
+        for offset in sorted(set(index.lookup(target))):
+            line = self._line_at_offset(offset)
+            # The index is hashed; make sure the row really lists the word
+            forms = lemma_variants(extract_field(line, field_idx, self.delimiter))
+            if target in {normalize_field(form) for form in forms}:
+                rows.append(parse_line(line, self.delimiter))
+        return rows
+
+    def _lemma_index(self, field):
+        return self._get_index(LemmaIndex, field)
+
+    def suggest(self, word, limit=10, max_distance=2):
+        """
+        Suggest headwords for a partial or misspelled word.
+
+        Completions of word as a prefix come first (in sorted order), then
+        headwords within max_distance edits, closest first.  Needs the
+        sidecar indexes; returns an empty list when indexing is off.
+
+        Returns:
+            list: Headwords as spelled in the file.
+        """
+        target = normalize_key(word.strip())
+        index = self._suggest_index()
+        if not target or index is None:
+            return []
+        keys = index.prefix_keys(target, limit)
+        if len(keys) < limit and max_distance > 0:
+            trigram_index = self._trigram_index()
+            if trigram_index is not None:
+                for _, key in trigram_index.search(target.decode("utf-8"), max_distance, limit):
+                    if key not in keys:
+                        keys.append(key)
+        return self._headwords(index, keys[:limit])
+
+    def _suggest_index(self):
+        # Prefix scans need key order, so unsorted files get a sorted index too
+        return self._get_index(SortedOffsetIndex)
+
+    def _trigram_index(self):
+        # Building it takes about a second per 100k rows: do that in the
+        # background and make do with prefix suggestions meanwhile
+        return self._get_index(TrigramIndex, background=True)
+
+    def _headwords(self, index, keys):
+        """Map normalized keys to the spelling of their first row in the file."""
+        key_idx = self.header.index(self.search_field)
+        words = []
+        for key in keys:
+            offsets = index.lookup(key)
+            if offsets:
+                raw = extract_field(self._line_at_offset(min(offsets)), key_idx, self.delimiter)
+                words.append(raw.decode("utf-8", "replace"))
+        return words
+
+    def _line_at_offset(self, offset):
+        with self._lock:
+            if self._fh is None:
+                self._fh = open_source(self.csv_path)
+            self._fh.seek(offset)
+            return self._fh.readline()
+
+    def _mapped(self):
+        """Return a read-only mmap of the CSV, opening it on first use."""
+        if self._mm is None:
+            with open(self.csv_path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _line_at(self, mm, pos, key_idx):
+        """Return (line, raw key) for the line starting at pos."""
+        end = mm.find(b'\n', pos)
+        line = mm[pos:len(mm) if end < 0 else end]
+        return line, extract_field(line, key_idx, self.delimiter)
+
+    def _bisect(self, mm, groups, results):
+        """
+        Binary search a sorted CSV directly over its raw bytes.
+
+        Probes resync on the next newline and compare only the lowercased
+        search column; rows are decoded only once they match.  Targets are
+        visited in order, each search starting where the last one ended.
+        """
+        key_idx = self.header.index(self.search_field)
+        size = len(mm)
+        start = mm.find(b'\n') + 1 or size
+
+        def line_start(pos):
+            # First line starting at or after pos
+            if pos <= start:
+                return start
+            nl = mm.find(b'\n', pos - 1)
+            return size if nl < 0 else nl + 1
 
-                # approximate location found
-                # If the target records exist, they will be close after /low/
-                f.seek(low)
-                while cur_word.lower() <= word_lower: # also handle hit end of file
-                    line = f.readline()
-                    cur_word = dict_from_record(line, self.header, self.delimiter).get(self.search_field, '')
-                    if cur_word == word:
-                        data.append(next(csv.reader([line], delimiter=self.delimiter)))
+        low = start
+        for target in sorted(groups):
+            wanted = groups[target]
+            # Smallest position whose following line has a key >= target
+            high = size
+            while low < high:
+                mid = (low + high) // 2
+                pos = line_start(mid)
+                if pos >= size or normalize_field(self._line_at(mm, pos, key_idx)[1]) >= target:
+                    high = mid
+                else:
+                    low = mid + 1
 
-        return data
+            pos = low = line_start(low)
+            while pos < size:
+                line, key = self._line_at(mm, pos, key_idx)
+                if normalize_field(key) != target:
+                    if key or line.strip():
+                        break
+                elif key in wanted:
+                    results[wanted[key]].append(parse_line(line, self.delimiter))
+                pos += len(line) + 1
 
+    def _merge(self, mm, groups, results):
+        """Resolve sorted targets with one forward pass over a sorted CSV."""
+        key_idx = self.header.index(self.search_field)
+        size = len(mm)
+        targets = sorted(groups)
+        t = 0
+        pos = mm.find(b'\n') + 1 or size
+        while pos < size and t < len(targets):
+            line, key = self._line_at(mm, pos, key_idx)
+            pos += len(line) + 1
+            if not key:
+                continue
+            norm = normalize_field(key)
+            while t < len(targets) and targets[t] < norm:
+                t += 1
+            if t < len(targets) and targets[t] == norm:
+                wanted = groups[norm]
+                if key in wanted:
+                    results[wanted[key]].append(parse_line(line, self.delimiter))
 
 if __name__ == "__main__":
     # file_path = os.path.expanduser('~/.var/app/net.ankiweb.Anki/data/Anki2/addons21/quickfill/data/dictionary.csv')
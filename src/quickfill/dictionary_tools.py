@@ -0,0 +1,148 @@
+"""
+Tools menu commands for building local dictionaries.
+
+compile_dictionary() imports a CSV dictionary into SQLite; mirror_word_list()
+pre-fetches a word list from a web source into the offline mirror.  Both run
+in the background with a progress bar.
+"""
+import csv
+
+from aqt import mw
+from aqt.operations import QueryOp
+from aqt.qt import QInputDialog
+from aqt.utils import getFile, showInfo, showWarning
+
+from .mirror import crawl, read_words
+from .sqlite_dict import compile_csv
+
+SNIFF_DELIMITERS = ",\t;|"
+
+
+def _settings_for(csv_path, models):
+    """Return (delimiter, search field) of a local_csv source using csv_path, if any."""
+    for sources in models.values():
+        for source in sources:
+            config = source.get("config", {})
+            if source.get("fetcher") == "local_csv" and config.get("csv_path") == csv_path:
+                return config.get("delimiter", "\t"), config.get("csv_search_field", "term")
+    return None, None
+
+
+def _read_header(csv_path):
+    """Guess the delimiter from the first line and return (delimiter, header)."""
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        first = f.readline()
+    try:
+        delimiter = csv.Sniffer().sniff(first, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = "\t"
+    return delimiter, next(csv.reader([first], delimiter=delimiter), [])
+
+
+def compile_dictionary(models):
+    """
+    Ask for a CSV file and compile it to <csv>.sqlite3.
+
+    Args:
+        models (dict): The add-on's note type -> sources config, used to
+            reuse the delimiter and search field of an existing source.
+    """
+    csv_path = getFile(mw, "Compile CSV Dictionary", None,
+                       filter="Dictionaries (*.csv *.tsv *.txt);;All files (*)", key="quickfill_compile")
+    if not csv_path:
+        return
+
+    delimiter, search_field = _settings_for(csv_path, models)
+    if search_field is None:
+        try:
+            delimiter, header = _read_header(csv_path)
+        except (OSError, UnicodeDecodeError) as e:
+            showWarning(f"Could not read {csv_path}:\n{e}")
+            return
+        if not header:
+            showWarning(f"{csv_path} has no header row")
+            return
+        search_field, ok = QInputDialog.getItem(mw, "Compile CSV Dictionary",
+                                                "Column to look words up in:", header, 0, False)
+        if not ok:
+            return
+
+    def progress(rows, done, total):
+        mw.taskman.run_on_main(lambda: mw.progress.update(
+            label=f"Compiling dictionary: {rows} rows", value=done, max=total))
+
+    def on_done(result):
+        db_path, rows = result
+        showInfo(f"Compiled {rows} rows into\n{db_path}\n\n"
+                 f"To use it, add a source with \"fetcher\": \"local_sqlite\" and\n"
+                 f"\"config\": {{\"db_path\": \"{db_path}\"}}, keeping the same \"mapping\".",
+                 title="QuickFill")
+
+    QueryOp(
+        parent=mw,
+        op=lambda col: compile_csv(csv_path, search_field, delimiter=delimiter, progress=progress),
+        success=on_done,
+    ).failure(lambda e: showWarning(f"Compiling {csv_path} failed:\n{e}")).with_progress(
+        "Compiling dictionary..."
+    ).without_collection().run_in_background()
+
+
+def mirror_word_list(registry, models, workers=4):
+    """
+    Ask for a word list and a web source, then look every word up through
+    that source into registry.mirror.  Words already mirrored are skipped,
+    so running it again resumes a cancelled crawl.
+
+    Args:
+        registry (FetcherRegistry): The add-on's registry, with a mirror.
+        models (dict): Compiled note type -> [SourcePlan, ...].
+        workers (int): Lookups run in parallel.
+    """
+    choices = {}
+    for model_name, plans in models.items():
+        for plan in plans:
+            fetcher = registry.get_fetcher(plan.fetcher) if plan.fetcher else None
+            if fetcher is not None and fetcher.cacheable:
+                choices[f"{model_name} / {plan.name}"] = (plan, fetcher)
+    if not choices:
+        showWarning("No web sources are configured to mirror.", title="QuickFill")
+        return
+
+    words_path = getFile(mw, "Mirror Word List", None,
+                         filter="Word lists (*.txt *.tsv);;All files (*)", key="quickfill_mirror")
+    if not words_path:
+        return
+    try:
+        words = read_words(words_path)
+    except (OSError, UnicodeDecodeError) as e:
+        showWarning(f"Could not read {words_path}:\n{e}")
+        return
+    if not words:
+        showWarning(f"{words_path} has no words")
+        return
+    label, ok = QInputDialog.getItem(mw, "Mirror Word List",
+                                     f"Source to look {len(words)} words up in:", list(choices), 0, False)
+    if not ok:
+        return
+    plan, fetcher = choices[label]
+
+    def progress(done, total):
+        mw.taskman.run_on_main(lambda: mw.progress.update(
+            label=f"Mirroring {plan.name}: {done}/{total}", value=done, max=total))
+
+    def on_done(counts):
+        stopped = "Stopped early; run the command again to resume.\n\n" if counts["stopped"] else ""
+        showInfo(f"{stopped}{counts['stored']} words stored, {counts['skipped']} already mirrored, "
+                 f"{counts['empty']} not found, {counts['failed']} failed.\n\n"
+                 f"Mirrored words now fill from\n{registry.mirror.path}\nwithout going online.",
+                 title="QuickFill")
+
+    QueryOp(
+        parent=mw,
+        op=lambda col: crawl(registry.mirror, words, plan, lambda word: registry.fetch_quietly(word, plan),
+                             fetcher.cache_version, workers=workers, progress=progress,
+                             cancelled=mw.progress.want_cancel),
+        success=on_done,
+    ).failure(lambda e: showWarning(f"Mirroring {words_path} failed:\n{e}")).with_progress(
+        "Mirroring word list..."
+    ).without_collection().run_in_background()
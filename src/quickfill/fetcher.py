@@ -1,43 +1,368 @@
-from aqt.utils import showInfo
-from aqt import mw
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+
+from .metrics import metrics
+from .source_plan import SourcePlan
 from . import fetchers # import CSVFetcher # , YahooFetcher  # Import directly from fetchers
 
+logger = logging.getLogger(__name__)
+
+# Pseudo-fetcher that fans a lookup out to several other sources
+COMBINED = "combined"
+MERGE_POLICIES = ("first_non_empty", "priority", "concatenate")
+DEFAULT_DEADLINE = 10  # seconds
+FANOUT_THREAD_PREFIX = "quickfill-fanout"
+
+
+def expand_sources(sources):
+    """
+    Resolve the "sources" of combined entries in a note type's source list.
+
+    Combined sources may name other sources of the same note type (by
+    "name") or give them inline; both become full source dicts.
+    """
+    by_name = {s.get("name"): s for s in sources if s.get("fetcher") != COMBINED}
+    expanded = []
+    for source in sources:
+        if source.get("fetcher") == COMBINED:
+            source = dict(source)
+            source["sources"] = [
+                by_name[ref] if isinstance(ref, str) and ref in by_name else ref
+                for ref in source.get("sources", [])
+            ]
+            missing = [ref for ref in source["sources"] if isinstance(ref, str)]
+            if missing:
+                logger.debug("Combined source '%s' references unknown sources %s", source.get('name'), missing)
+                source["sources"] = [ref for ref in source["sources"] if not isinstance(ref, str)]
+        expanded.append(source)
+    return expanded
+
+
 class FetcherRegistry:
-    def __init__(self):
+    """
+    Looks words up through the configured sources.
+
+    Nothing here depends on Anki: fetcher messages go to message_callback
+    (the add-on passes one that shows them in a popup; without one they are
+    logged), so the registry also works from the command line.
+    """
+
+    def __init__(self, cache=None, max_workers=8, media=None, mirror=None, message_callback=None):
         self.fetchers = {}
+        self.message_callback = message_callback
+        self.cache = cache
+        self.mirror = mirror
+        self.media = media
+        self._local = threading.local()
+        self._max_workers = max_workers
+        self._executor = None
+        self._fanout_executor = None
+        self._executor_lock = threading.Lock()
+        self._fetchers_lock = threading.Lock()
         self.load_fetchers()
 
     def load_fetchers(self):
-        # Instantiate all fetchers from fetchers/__init__.py
-        print(f"Debug: Registered fetchers: {list(self.fetchers.keys())}")
-        for cls in fetchers.all_fetchers:
-            self.fetchers[cls.source_name()] = cls(message_callback=showInfo)
-        print(f"Debug: Registered fetchers: {list(self.fetchers.keys())}")
+        # Fetchers are discovered without importing them; each one is
+        # imported and instantiated the first time its source is used.
+        logger.debug("Available fetchers: %s", fetchers.available_sources())
+
+    def compile_models(self, models):
+        """
+        Compile config.json's note type -> sources lists into SourcePlans,
+        resolving combined sources.
+
+        Returns:
+            tuple: ({note type: [SourcePlan, ...]}, [config error, ...])
+        """
+        known = set(fetchers.available_sources()) | {COMBINED}
+        compiled = {}
+        errors = []
+        for model_name, sources in models.items():
+            names = {s.get("name") for s in sources if s.get("fetcher") != COMBINED}
+            for source in sources:
+                if source.get("fetcher") == COMBINED:
+                    errors.extend(f"{model_name} / {source.get('name', COMBINED)}: unknown source '{ref}'"
+                                  for ref in source.get("sources", []) if isinstance(ref, str) and ref not in names)
+            # Plain sources first, so combined ones refer to the same plans
+            plans = [source if source.get("fetcher") == COMBINED else SourcePlan(source, known)
+                     for source in sources]
+            plans = [source if isinstance(source, SourcePlan) else SourcePlan(source, known)
+                     for source in expand_sources(plans)]
+            for plan in plans:
+                errors.extend(f"{model_name} / {plan.name}: {e}" for e in plan.errors)
+                policy = plan.get("merge", "first_non_empty")
+                if plan.fetcher == COMBINED and policy not in MERGE_POLICIES:
+                    errors.append(f"{model_name} / {plan.name}: unknown merge policy '{policy}'")
+            compiled[model_name] = plans
+        for error in errors:
+            logger.warning("Config: %s", error)
+        return compiled, errors
+
+    def get_fetcher(self, source):
+        """Return the fetcher instance for a source name, creating it on first use."""
+        fetcher = self.fetchers.get(source)
+        if fetcher is not None:
+            return fetcher
+        with self._fetchers_lock:
+            if source not in self.fetchers:
+                cls = fetchers.load_fetcher(source)
+                if cls is None:
+                    return None
+                self.fetchers[source] = cls(message_callback=self._message)
+                logger.debug("Registered fetcher: %s", source)
+            return self.fetchers[source]
+
+    def _message(self, msg):
+        """Show a fetcher message, or collect it if this thread is fetching quietly."""
+        collected = getattr(self._local, "messages", None)
+        if collected is not None:
+            collected.append(msg)
+        elif self.message_callback is not None:
+            self.message_callback(msg)
+        else:
+            logger.warning("%s", msg)
+
+    @contextmanager
+    def _collecting(self):
+        """Collect this thread's fetcher messages into a list instead of showing them."""
+        outer = getattr(self._local, "messages", None)
+        self._local.messages = []
+        try:
+            yield self._local.messages
+        finally:
+            self._local.messages = outer
 
     def fetch(self, word, config):
         source = config.get('fetcher')
-        fetcher = self.fetchers.get(source)
+        if source == COMBINED:
+            with metrics.timer(COMBINED, "fetch"):
+                return self.fetch_combined(word, config)
+        fetcher = self.get_fetcher(source)
         if not fetcher:
-            showInfo(f"No fetcher found for source '{source}'")
+            self._message(f"No fetcher found for source '{source}'")
             return []
-        data_list = fetcher.fetch(word, config)
-        print(f"Debug: data_list after fetch: {data_list}")
+        ttl_days = config.get("cache_ttl_days")
+        with metrics.timer(source, "fetch"):
+            mirrored = self._mirrored(fetcher, word, config)
+            if mirrored:
+                data_list = mirrored
+            elif self.cache is not None and fetcher.cacheable and ttl_days != 0:
+                data_list = self._fetch_cached(fetcher, word, config,
+                                               None if ttl_days is None else ttl_days * 86400)
+            else:
+                data_list = fetcher.fetch(word, config)
+        if data_list and self.media is not None:
+            data_list = self.media.localize(data_list)
+        logger.debug("data_list after fetch: %s", data_list)
         return data_list
 
+    def suggest(self, word, config, limit=10):
+        """
+        Return suggested headwords from a source (for combined sources, from
+        each sub-source in order), or an empty list if it has none.
+        """
+        if config.get('fetcher') == COMBINED:
+            suggestions = []
+            for source in config.get("sources", []):
+                suggestions.extend(s for s in self.suggest(word, source, limit) if s not in suggestions)
+            return suggestions[:limit]
+        fetcher = self.get_fetcher(config.get('fetcher'))
+        if not fetcher:
+            return []
+        try:
+            return fetcher.suggest(word, config, limit)
+        except Exception as e:
+            logger.warning("Suggestions for '%s' from %s failed: %s", word, config.get('fetcher'), e)
+            return []
+
+    def _mirrored(self, fetcher, word, config):
+        """Return the offline mirror's entry for word, or None."""
+        if self.mirror is None or not fetcher.cacheable:
+            return None
+        key = self.mirror.make_key(fetcher.source_name(), word, config, fetcher.cache_version)
+        try:
+            return self.mirror.get(key)
+        except sqlite3.Error as e:
+            logger.warning("Mirror read failed: %s", e)
+            return None
+
+    def _fetch_cached(self, fetcher, word, config, ttl):
+        """Serve from the response cache, refreshing expired or missing entries."""
+        source = fetcher.source_name()
+        key = self.cache.make_key(source, word, config, fetcher.cache_version)
+        try:
+            cached, fresh = self.cache.get(key, ttl)
+        except sqlite3.Error as e:
+            logger.warning("Response cache read failed: %s", e)
+            cached, fresh = None, False
+        if fresh:
+            return cached
+
+        with self._collecting() as messages:
+            data = fetcher.fetch(word, config)
+        if data:
+            try:
+                self.cache.put(key, source, word, data)
+            except sqlite3.Error as e:
+                logger.warning("Response cache write failed: %s", e)
+            return data
+        if cached is not None:
+            # Offline or the source is down: an expired answer beats none
+            logger.debug("Serving expired cache entry for '%s' from %s", word, source)
+            return cached
+        for msg in messages:
+            self._message(msg)
+        return data
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix="quickfill")
+            return self._executor
+
+    def _get_fanout_executor(self):
+        # Combined sources fan out on their own pool: on the shared one, a
+        # combined fetch started by submit() would hold a worker while its
+        # sub-fetches queue behind it until their deadline
+        with self._executor_lock:
+            if self._fanout_executor is None:
+                self._fanout_executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                           thread_name_prefix=FANOUT_THREAD_PREFIX)
+            return self._fanout_executor
+
+    def _fan_out(self, word, sources):
+        """Start quiet fetches of each sub-source; return {Future: source index}."""
+        if threading.current_thread().name.startswith(FANOUT_THREAD_PREFIX):
+            # A combined source nested in another one: fetch inline rather
+            # than wait on the pool this thread belongs to
+            futures = {}
+            for i, sub in enumerate(sources):
+                future = Future()
+                try:
+                    future.set_result(self.fetch_quietly(word, sub))
+                except Exception as e:
+                    future.set_exception(e)
+                futures[future] = i
+            return futures
+        executor = self._get_fanout_executor()
+        return {executor.submit(self.fetch_quietly, word, sub): i for i, sub in enumerate(sources)}
+
+    def fetch_combined(self, word, config):
+        """
+        Query all sub-sources of a combined source in parallel and merge them.
+
+        Each sub-source has a deadline (its own "deadline", else the combined
+        source's, in seconds); results arriving later are ignored, so the
+        fill takes as long as the slowest source within budget.
+        """
+        sources = config.get("sources", [])
+        policy = config.get("merge", "first_non_empty")
+        if policy not in MERGE_POLICIES:
+            self._message(f"Unknown merge policy '{policy}' (expected one of {', '.join(MERGE_POLICIES)})")
+            return {}
+        if not sources:
+            return {}
+        default_deadline = config.get("deadline", DEFAULT_DEADLINE)
+        deadlines = [sub.get("deadline", default_deadline) for sub in sources]
+
+        start = time.monotonic()
+        futures = self._fan_out(word, sources)
+        results = {}      # source index -> data
+        completed = []    # source indices in completion order
+        messages = []
+        try:
+            for future in as_completed(futures, timeout=max(deadlines)):
+                i = futures[future]
+                if time.monotonic() - start > deadlines[i]:
+                    continue
+                try:
+                    data, sub_messages = future.result()
+                except Exception as e:
+                    sub_messages = [f"{sources[i].get('name', sources[i].get('fetcher'))}: {e}"]
+                    data = None
+                messages.extend(sub_messages)
+                if data:
+                    results[i] = data
+                    completed.append(i)
+        except FuturesTimeoutError:
+            late = [sources[i].get("name", sources[i].get("fetcher"))
+                    for f, i in futures.items() if not f.done()]
+            logger.debug("Combined fetch ignoring sources past their deadline: %s", late)
+
+        merged = self._merge(results, completed, policy, config.get("separator", "<br>"))
+        if not merged:
+            for msg in messages:
+                self._message(msg)
+        return merged
+
+    @staticmethod
+    def _merge(results, completed, policy, separator):
+        merged = {}
+        if policy == "concatenate":
+            for i in sorted(results):
+                for field_idx, value in results[i].items():
+                    if value:
+                        merged[field_idx] = (f"{merged[field_idx]}{separator}{value}"
+                                             if merged.get(field_idx) else value)
+            return merged
+
+        # first_non_empty: whichever source answered first wins a field;
+        # priority: the earliest source in the list wins a field
+        order = completed if policy == "first_non_empty" else sorted(results)
+        for i in order:
+            for field_idx, value in results[i].items():
+                if value and not merged.get(field_idx):
+                    merged[field_idx] = value
+        return merged
+
+    def submit(self, word, config):
+        """
+        Start a quiet fetch in the background.
+
+        Returns:
+            Future: Resolves to fetch_quietly()'s (data, messages).
+        """
+        return self._get_executor().submit(self.fetch_quietly, word, config)
+
+    def fetch_quietly(self, word, config):
+        """
+        Fetch without showing popups; safe to call from worker threads.
+
+        Returns:
+            tuple: (data, messages) where messages are the texts the fetcher
+            would otherwise have shown.
+        """
+        with self._collecting() as messages:
+            return self.fetch(word, config), messages
+
+    @staticmethod
+    def apply_data(note, data):
+        """Copy a {field_idx: value} dict into note; return True if any field was set."""
+        assigned = False
+        for field_idx, value in data.items():
+            if field_idx >= 0 and field_idx < len(note.fields):
+                note.fields[field_idx] = value
+                assigned = True
+                logger.debug("Assigning field %s='%s'", field_idx, value)
+            else:
+                logger.warning("Field index %s out of range for note with %s fields", field_idx, len(note.fields))
+        return assigned
+
     def fill_note(self, note, word, config, editor):
-        print(f"Debug: Note fields count: {len(note.fields)}")
-        print(f"Debug: Note fields: {note.fields}")
-        print(f"Debug: Note ID: {note.id}")
+        logger.debug("Note fields count: %s", len(note.fields))
+        logger.debug("Note fields: %s", note.fields)
+        logger.debug("Note ID: %s", note.id)
         data = self.fetch(word, config)
         if not data:
             return False
         else:
-            for field_idx, value in data.items():
-                if field_idx >= 0 and field_idx < len(note.fields):
-                    note.fields[field_idx] = value
-                    print(f"Debug: Assigning field {field_idx}='{value}'")
-                else:
-                    print(f"Debug: Field index {field_idx} out of range for note with {len(note.fields)} fields")
+            self.apply_data(note, data)
         editor.loadNoteKeepingFocus()
-        print("Debug: Editor refreshed with loadNoteKeepingFocus")
+        logger.debug("Editor refreshed with loadNoteKeepingFocus")
         return True
@@ -1,47 +1,135 @@
+import ast
 import importlib
-import inspect
+import logging
+import threading
 from pathlib import Path
 
 # Import Fetcher from parent package
 from ..base_fetcher import Fetcher
 
-__all__ = ['all_fetchers']
-all_fetchers = []
+logger = logging.getLogger(__name__)
 
-def _load_fetchers():
-    """Dynamically load all Fetcher subclasses from the fetchers/ directory."""
-    fetchers = {}
-    package_name = __name__
-    package_path = Path(__file__).parent
-    print(f"Debug: Loading fetchers from {package_path}")
+__all__ = ['all_fetchers', 'available_sources', 'load_fetcher']
 
-    # List all .py files in fetchers/
-    py_files = [f.name for f in package_path.glob('*.py') if f.name != '__init__.py']
-    print(f"Debug: Found Python files in fetchers/: {py_files}")
+_package_path = Path(__file__).parent
+_import_lock = threading.RLock()
 
-    for file_path in package_path.glob('*.py'):
+
+def _scan_module(file_path):
+    """
+    Find the fetcher classes in a module without importing it.
+
+    Returns:
+        tuple: ({source_name: class_name}, [class names whose source_name
+        isn't a plain string literal])
+    """
+    sources, dynamic = {}, []
+    try:
+        tree = ast.parse(file_path.read_text(encoding="utf-8"), str(file_path))
+    except (OSError, SyntaxError, UnicodeDecodeError) as e:
+        logger.warning("Could not scan fetcher module %s: %s", file_path.name, e)
+        return sources, dynamic
+
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef) or not node.bases:
+            continue
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and item.name == "source_name":
+                returns = [n for n in item.body if isinstance(n, ast.Return)]
+                value = returns[0].value if len(returns) == 1 else None
+                if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                    sources[value.value] = node.name
+                else:
+                    dynamic.append(node.name)
+                break
+    return sources, dynamic
+
+
+def _scan_fetchers():
+    """
+    Build the manifest of fetchers in the fetchers/ directory.
+
+    Only source files are read, so discovering fetchers doesn't import
+    requests, bs4 or anything else a fetcher depends on.
+    """
+    sources, classes, dynamic_modules = {}, {}, []
+    for file_path in sorted(_package_path.glob('*.py')):
         if file_path.name == '__init__.py':
             continue
         module_name = file_path.stem
-        try:
-            # Import module relative to quickfill.fetchers
-            module = importlib.import_module(f"{package_name}.{module_name}")
-            print(f"Debug: Successfully imported module {module_name}")
-            # Find Fetcher subclasses
-            for attr_name in dir(module):
-                attr = getattr(module, attr_name)
-                if isinstance(attr, type) and issubclass(attr, Fetcher) and attr != Fetcher:
-                    fetchers[attr_name] = attr
-
-        except Exception as e:
-            print(f"Debug: Failed to import module {module_name}: {str(e)}")
-
-    return fetchers
-
-# Load fetchers and update globals
-for name, obj in _load_fetchers().items():
-    globals()[name] = obj
-    if name not in __all__:
-        __all__.append(name)
-        all_fetchers.append(obj)
+        found, dynamic = _scan_module(file_path)
+        for source, class_name in found.items():
+            sources[source] = (module_name, class_name)
+            classes[class_name] = module_name
+        for class_name in dynamic:
+            classes[class_name] = module_name
+        if dynamic:
+            dynamic_modules.append(module_name)
+    logger.debug("Found fetcher sources %s in %s", list(sources), _package_path)
+    return sources, classes, dynamic_modules
+
+
+_sources, _classes, _dynamic_modules = _scan_fetchers()
+_loaded = {}  # module name -> {class name: Fetcher subclass}, or None if it failed
+
+
+def _import(module_name):
+    """Import a fetcher module on first use and return its Fetcher subclasses."""
+    with _import_lock:
+        if module_name not in _loaded:
+            try:
+                module = importlib.import_module(f"{__name__}.{module_name}")
+                logger.debug("Successfully imported module %s", module_name)
+                _loaded[module_name] = {
+                    name: attr for name, attr in vars(module).items()
+                    if isinstance(attr, type) and issubclass(attr, Fetcher) and attr is not Fetcher
+                    and attr.__module__ == module.__name__  # not ones it imports
+                }
+                for name, cls in _loaded[module_name].items():
+                    globals()[name] = cls
+            except Exception as e:
+                logger.warning("Failed to import module %s: %s", module_name, e)
+                _loaded[module_name] = None
+        return _loaded[module_name] or {}
+
+
+def available_sources():
+    """Return the source names that can be used as "fetcher" in config.json."""
+    return list(_sources)
+
+
+def load_fetcher(source):
+    """
+    Return the Fetcher subclass for a source name, importing its module on
+    first use; None if no fetcher provides the source.
+    """
+    if source in _sources:
+        module_name, class_name = _sources[source]
+        cls = _import(module_name).get(class_name)
+        if cls is not None:
+            return cls
+    # Fetchers that compute source_name() can only be found by importing them
+    for module_name in _dynamic_modules:
+        for cls in _import(module_name).values():
+            if cls.source_name() == source:
+                _sources[source] = (module_name, cls.__name__)
+                return cls
+    return None
+
+
+def __getattr__(name):
+    """Import fetcher classes (and the legacy all_fetchers list) on first access."""
+    if name in _classes:
+        cls = _import(_classes[name]).get(name)
+        if cls is not None:
+            return cls
+    elif name == 'all_fetchers':
+        found = []
+        for module_name in sorted(set(_classes.values())):
+            found.extend(_import(module_name).values())
+        return found
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+def __dir__():
+    return sorted(set(globals()) | set(_classes) | {'all_fetchers'})
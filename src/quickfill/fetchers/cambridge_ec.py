@@ -1,7 +1,9 @@
-import requests
 from bs4 import BeautifulSoup
 import urllib.parse
 from .. import Fetcher
+from ..html_parsing import make_soup, strainer
+from ..media import sound_tag
+from ..source_plan import SourcePlan
 
 from urllib.parse import urljoin
 import re, unicodedata
@@ -33,14 +35,31 @@ class CambridgeECFetcher(Fetcher):
         "verb": "v."
     }
 
+    cacheable = True
+
     @staticmethod
     def source_name():
         return "cambridge_en_tc"
 
-    def _fetch_soup(self, word):
-        r = requests.get(urljoin(self.base_url, word), headers=self.headers, timeout=10)
+    def page_url(self, word):
+        return urljoin(self.base_url, word)
+
+    def make_soup(self, html, parser="html.parser", targeted=True):
+        """
+        Parse an entry page.  With targeted=True only the page's <article>
+        (which holds every entry block _parse_cambridge reads) is built,
+        skipping the navigation, ads and scripts around it.
+        """
+        parse_only = strainer("article") if targeted else None
+        return make_soup(html, parser, parse_only=parse_only)
+
+    def _fetch_page(self, word):
+        r = self.http_get(self.page_url(word), headers=self.headers)
         r.raise_for_status()
-        return BeautifulSoup(r.text, "html.parser")
+        return r.text
+
+    def _fetch_soup(self, word, parser="html.parser"):
+        return self.make_soup(self._fetch_page(word), parser)
 
     def _fetch_entry_file(self):
         filename = '/home/agc/dev/QuickFill/tmp/https___dictionary.cambridge.org_dictionary_english-chinese-traditional_train.html'
@@ -50,8 +69,8 @@ class CambridgeECFetcher(Fetcher):
 
     def fetch(self, word, config):
         """Scrape word data from Yahoo Dictionary and map to field indices."""
-        parser = config.get("config", {}).get("parser", "html.parser")
-        field_map = config.get("mapping", {})
+        plan = SourcePlan.of(config)
+        parser = plan.settings.get("parser", "html.parser")
 
         url = self.base_url + urllib.parse.quote(word)
 
@@ -59,17 +78,23 @@ class CambridgeECFetcher(Fetcher):
         # 1. Fetch URL and and parse HTML
         # ------------------------------------------------------------------ #
         try:
-            soup = self._fetch_soup(word)
+            html = self._fetch_page(word)
         except Exception as e:
-            self.message_callback(f"Parse error: {e}")
+            self.message_callback(f"Network error: {e}")
             return {}
 
-        parsed = self._parse_cambridge(soup)
+        with self.timed("parse"):
+            try:
+                soup = self.make_soup(html, parser)
+            except Exception as e:
+                self.message_callback(f"Parse error: {e}")
+                return {}
+
+            parsed = self._parse_cambridge(soup)
 
         # Build pronunciation & audio
         pronunciation = []
         pron_set = set()
-        audio = []
 
         all_prons = [pron for pos in parsed['pos_sections'] for pron in pos['prons']]
         for pron in all_prons:
@@ -91,6 +116,12 @@ class CambridgeECFetcher(Fetcher):
             
         pronunciation = '<br>'.join(sorted(set(pronunciation)))
 
+        # Remote sound tags; the registry downloads them into the media folder
+        region = plan.settings.get("audio_region")  # "uk" or "us"; default both
+        audio_urls = dict.fromkeys(pron["audio"] for pron in all_prons
+                                   if pron["audio"] and (not region or pron["region"] == region))
+        audio = "".join(sound_tag(url) for url in audio_urls)
+
         # Build translations and examples
         translation = []
         examples = []
@@ -108,24 +139,19 @@ class CambridgeECFetcher(Fetcher):
         translation = '<br>'.join(translation)
         examples = '<br>'.join(examples)
 
-        data = {}
-
         # ------------------------------------------------------------------ #
         # 6. Map everything to note-field indices
         # ------------------------------------------------------------------ #
-        main_mapped = {}
-
-        for key, idx in field_map.items():
-            if idx < 0:
-                continue
-            data[idx] = {
+        with self.timed("mapping"):
+            data = plan.project({
                 "word": word,
                 "pronunciation": pronunciation,
                 "pos": '',
                 "inflections": '',
                 "def_zh": translation,
                 "examples": examples,
-            }.get(key, "")
+                "audio": audio,
+            })
 
         return data
 
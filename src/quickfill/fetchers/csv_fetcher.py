@@ -1,16 +1,20 @@
 import csv
+import logging
 import sys
 import os
+from contextlib import nullcontext
 from io import StringIO
 from .. import Fetcher
 from .. import CSVSeeker
+from ..seeker_pool import seeker_pool
+from ..source_plan import SourcePlan
 
+logger = logging.getLogger(__name__)
 
 # Add parent directory to sys.path for standalone and Anki
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
-print(f"Debug: sys.path: {sys.path}")
 
 
 class CSVFetcher(Fetcher):
@@ -37,67 +41,91 @@ class CSVFetcher(Fetcher):
             field_mappings = config.get('csv_field_mappings', {})
             results = []
             for row in rows:
-                print(f"Debug: Raw CSV row: {row}")
-                print(f"Debug: Row length: {len(row)}")
+                logger.debug("Raw CSV row: %s", row)
+                logger.debug("Row length: %s", len(row))
                 data = {}
                 for key, idx in field_mappings.items():
                     if idx >= 0:
                         try:
                             data[idx] = row[idx] if idx < len(row) else ''
-                            print(f"Debug: Mapping {key} to index {idx}: {data[idx]}")
+                            logger.debug("Mapping %s to index %s: %s", key, idx, data[idx])
                         except IndexError:
-                            print(f"Debug: Field index {idx} out of range for row: {row}")
+                            logger.warning("Field index %s out of range for row: %s", idx, row)
                             data[idx] = ''
                 # Map 'other' field (-1) to remaining unmapped columns
                 if -1 in field_mappings.values():
                     mapped_indices = [idx for idx in field_mappings.values() if idx >= 0]
                     remaining = [row[i] for i in range(len(row)) if i not in mapped_indices and i < len(row)]
                     data[-1] = '; '.join(remaining) if remaining else ''
-                    print(f"Debug: Mapping 'other' to index -1: {data[-1]}")
+                    logger.debug("Mapping 'other' to index -1: %s", data[-1])
                 results.append(data)
-            print(f"Debug: CSVFetcher fetched data for '{word}': {results}")
+            logger.debug("CSVFetcher fetched data for '%s': %s", word, results)
             return results
         except Exception as e:
             self.message_callback(f"Error fetching CSV data: {str(e)}")
             return {}
 
-    def fetch(self, word, config):
-        csv_path = config.get("config", {}).get("csv_path")
-        csv_sorted = config.get("config", {}).get("csv_sorted", False)
-        delimiter = config.get("config", {}).get("delimiter", "\t")
-        csv_search_field = config.get("config", {}).get("csv_search_field", "term")  # Default to 'term' if not specified
-        field_mappings = config.get("mapping", {})
+    def _seeker(self, plan):
+        """
+        Lease the pooled seeker for a source plan; the context manager yields
+        None if its CSV is missing.
+        """
+        settings = plan.settings
+        csv_path = settings.get("csv_path")
         if not csv_path or not os.path.exists(csv_path):
-            if self.message_callback:
-                self.message_callback(f"CSV file not found: {csv_path}")
-            print(f"Debug: CSV file not found: {csv_path}")
-            return {}
+            logger.warning("CSV file not found: %s", csv_path)
+            return nullcontext(None)
+        return seeker_pool.lease(csv_path,
+                                 settings.get("csv_search_field", "term"),  # Default to 'term' if not specified
+                                 sorted=settings.get("csv_sorted", False),
+                                 delimiter=settings.get("delimiter", "\t"),
+                                 use_index=settings.get("csv_index", True),
+                                 in_memory=settings.get("csv_in_memory", False),
+                                 memory_limit=settings.get("csv_memory_limit_mb", 64) * 1024 * 1024)
+
+    def fetch(self, word, config):
+        plan = SourcePlan.of(config)
+        with self._seeker(plan) as seeker:
+            if seeker is None:
+                if self.message_callback:
+                    self.message_callback(f"CSV file not found: {plan.settings.get('csv_path')}")
+                return {}
 
-        seeker = CSVSeeker(csv_path, csv_search_field, sorted=csv_sorted, delimiter=delimiter)
-        rows = seeker.search(word)
-        print(f"Debug: Found {len(rows)} matching rows for '{word}' in CSV")
+            lemma_field = plan.settings.get("csv_lemma_field")
+            with self.timed("lookup"):
+                rows = seeker.search(word)
+                if not rows and lemma_field:
+                    # e.g. "geese": fill from the headword that lists it as a form
+                    rows = seeker.search_lemma(word, lemma_field)
+            header = seeker.header
+        logger.debug("Found %s matching rows for '%s' in CSV", len(rows), word)
         if not rows:
             if self.message_callback:
                 self.message_callback(f"No data found for '{word}' in CSV")
             return {}
 
-        # data_list = []
-        for row in rows:
-            print(f"Debug: Raw CSV row: {row}")
-            data = {}
-            for field_name, note_field_idx in field_mappings.items():
-                csv_col_idx = next((i for i, col in enumerate(seeker.header) if col == field_name), None)
-                if csv_col_idx is not None and csv_col_idx < len(row):
-                    value = row[csv_col_idx]
-                    if note_field_idx >= 0:
-                        data[note_field_idx] = value
-                        print(f"Debug: Mapping {field_name} (CSV col {csv_col_idx}) to note field {note_field_idx}: {value}")
-                else:
-                    print(f"Debug: Field '{field_name}' not found in CSV header or invalid index")
-            # data_list.append(data)
-        print(f"Debug: CSVFetcher fetched data for '{word}': {data}")
+        with self.timed("mapping"):
+            data = self.map_rows(header, rows, plan)
+        logger.debug("CSVFetcher fetched data for '%s': %s", word, data)
         return data
 
+    def suggest(self, word, config, limit=10):
+        plan = SourcePlan.of(config)
+        with self._seeker(plan) as seeker:
+            if seeker is None:
+                return []
+            max_distance = plan.settings.get("suggest_distance", 2)
+            with self.timed("suggest"):
+                return seeker.suggest(word, limit, max_distance)
+
+    @staticmethod
+    def map_rows(header, rows, plan):
+        """
+        Map matching rows to {note_field_idx: value} by header column name.
+        When several rows match, the last one wins.
+        """
+        return plan.project_row(header, rows[-1]) if rows else {}
+
 
 if __name__ == "__main__":
     # Mock test
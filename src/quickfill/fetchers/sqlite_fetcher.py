@@ -0,0 +1,70 @@
+import logging
+import os
+import sqlite3
+from .csv_fetcher import CSVFetcher
+from ..seeker_pool import seeker_pool
+from ..source_plan import SourcePlan
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteFetcher(CSVFetcher):
+    """
+    Fetcher for CSV dictionaries compiled to SQLite (see sqlite_dict.py).
+
+    Uses the same "mapping" as local_csv: CSV header names -> note fields.
+    """
+
+    @staticmethod
+    def source_name():
+        return "local_sqlite"
+
+    def fetch(self, word, config):
+        plan = SourcePlan.of(config)
+        db_path = _db_path(plan)
+        search_field = plan.settings.get("csv_search_field")  # Default: the compiled search field
+        if not db_path or not os.path.exists(db_path):
+            self.message_callback(f"Dictionary file not found: {db_path}")
+            logger.warning("Dictionary file not found: %s", db_path)
+            return {}
+
+        try:
+            with seeker_pool.lease_dictionary(db_path) as dictionary:
+                if search_field and search_field not in dictionary.header:
+                    self.message_callback(f"Field '{search_field}' is not in dictionary {db_path}")
+                    return {}
+                if search_field and not dictionary.is_indexed(search_field):
+                    logger.warning("'%s' is not indexed in %s; lookups scan the whole table",
+                                   search_field, db_path)
+                with self.timed("lookup"):
+                    rows = dictionary.search(word, search_field)
+                header = dictionary.header
+        except (ValueError, sqlite3.Error) as e:
+            self.message_callback(f"Dictionary error: {e}")
+            return {}
+        logger.debug("Found %s matching rows for '%s' in %s", len(rows), word, db_path)
+        if not rows:
+            self.message_callback(f"No data found for '{word}' in dictionary")
+            return {}
+
+        with self.timed("mapping"):
+            data = self.map_rows(header, rows, plan)
+        logger.debug("SQLiteFetcher fetched data for '%s': %s", word, data)
+        return data
+
+    def suggest(self, word, config, limit=10):
+        db_path = _db_path(SourcePlan.of(config))
+        if not db_path or not os.path.exists(db_path):
+            return []
+        try:
+            with self.timed("suggest"), seeker_pool.lease_dictionary(db_path) as dictionary:
+                return dictionary.suggest(word, limit)
+        except (ValueError, sqlite3.Error) as e:
+            logger.warning("Suggestions from %s failed: %s", db_path, e)
+            return []
+
+
+def _db_path(plan):
+    """The plan's db_path with ~ expanded, as SourcePlan checked it."""
+    db_path = plan.settings.get("db_path")
+    return os.path.expanduser(db_path) if isinstance(db_path, str) else db_path
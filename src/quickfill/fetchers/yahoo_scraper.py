@@ -1,58 +1,41 @@
 import requests
-from bs4 import BeautifulSoup
 import urllib.parse
 from .. import Fetcher
+from ..html_parsing import has_class, make_soup, strainer
+from ..source_plan import SourcePlan
 
 class YahooFetcher(Fetcher):
     """Fetcher for Yahoo Dictionary (Taiwan)."""
 
+    cacheable = True
+    base_url = "https://tw.dictionary.search.yahoo.com/search?p="
+
     @staticmethod
     def source_name():
         return "yahoo_en_tc"
 
-    def fetch(self, word, config):
-        """Scrape word data from Yahoo Dictionary and map to field indices."""
-        parser = config.get("config", {}).get("parser", "html.parser")
-        field_map = config.get("mapping", {})
-
-        base_url = "https://tw.dictionary.search.yahoo.com/search?p="
-        url = base_url + urllib.parse.quote(word)
-
-        headers = {
-            "User-Agent":
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        }
-
-        # ------------------------------------------------------------------ #
-        # 1. HTTP request
-        # ------------------------------------------------------------------ #
-        try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-        except requests.RequestException as e:
-            self.message_callback(f"Network error: {e}")
-            return {}
-
-        # ------------------------------------------------------------------ #
-        # 2. Parse HTML
-        # ------------------------------------------------------------------ #
-        try:
-            soup = BeautifulSoup(resp.text, parser)
-        except Exception as e:
-            self.message_callback(f"Parse error: {e}")
-            return {}
-
-        data = {}
-
+    def page_url(self, word):
+        return self.base_url + urllib.parse.quote(word)
+
+    def make_soup(self, html, parser="html.parser", targeted=True):
+        """
+        Parse a results page.  With targeted=True only the dictionary card
+        and explanation tab (all that extract() reads) are built.
+        """
+        parse_only = None
+        if targeted:
+            parse_only = strainer("div", class_=has_class("dictionaryWordCard",
+                                                          "grp-tab-content-explanation"))
+        return make_soup(html, parser, parse_only=parse_only)
+
+    def extract(self, soup, word):
+        """Pull the field values out of a parsed page; None if there is no entry."""
         # ------------------------------------------------------------------ #
-        # 3. Main dictionary card
+        # Main dictionary card
         # ------------------------------------------------------------------ #
         main_card = soup.find("div", class_="dictionaryWordCard")
         if not main_card:
-            self.message_callback(f"No entry for '{word}'")
-            return {}
+            return None
 
         # Word
         entry_word = (
@@ -81,7 +64,7 @@ class YahooFetcher(Fetcher):
         inflections = '<br>'.join(inflections)
 
         # ------------------------------------------------------------------ #
-        # 4: Chinese translations
+        # Chinese translations
         # ------------------------------------------------------------------ #
         def_zh_tag = main_card.find('div', class_="compList mb-25 p-rel")
 
@@ -98,7 +81,7 @@ class YahooFetcher(Fetcher):
         def_zh_str = '<br>'.join(def_list_zh)
 
         # ------------------------------------------------------------------ #
-        # 5. 釋義 Examples / Explanations
+        # 釋義 Examples / Explanations
         # ------------------------------------------------------------------ #
         explanation_div = soup.find("div", class_="grp-tab-content-explanation")
         pos = ""
@@ -113,27 +96,57 @@ class YahooFetcher(Fetcher):
 
             examples_str = explanation_div.decode_contents()
 
+        return {
+            "word": entry_word,
+            "pronunciation": pronunciation,
+            "pos": pos,
+            "inflections": inflections,
+            "def_zh": def_zh_str,
+            "examples": examples_str,
+        }
+
+    def fetch(self, word, config):
+        """Scrape word data from Yahoo Dictionary and map to field indices."""
+        plan = SourcePlan.of(config)
+        parser = plan.settings.get("parser", "html.parser")
+
+        url = self.page_url(word)
+
+        # ------------------------------------------------------------------ #
+        # 1. HTTP request
+        # ------------------------------------------------------------------ #
+        try:
+            resp = self.http_get(url)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            self.message_callback(f"Network error: {e}")
+            return {}
+
+        # ------------------------------------------------------------------ #
+        # 2. Parse HTML
+        # ------------------------------------------------------------------ #
+        with self.timed("parse"):
+            try:
+                soup = self.make_soup(resp.text, parser)
+            except Exception as e:
+                self.message_callback(f"Parse error: {e}")
+                return {}
+
+            values = self.extract(soup, word)
+        if values is None:
+            self.message_callback(f"No entry for '{word}'")
+            return {}
+
         # ------------------------------------------------------------------ #
-        # 6. Map everything to note-field indices
+        # 3. Map everything to note-field indices
         # ------------------------------------------------------------------ #
-        main_mapped = {}
-
-        for key, idx in field_map.items():
-            if idx < 0:
-                continue
-            data[idx] = {
-                "word": entry_word,
-                "pronunciation": pronunciation,
-                "pos": pos,
-                "inflections": inflections,
-                "def_zh": def_zh_str,
-                "examples": examples_str,
-            }.get(key, "")
+        with self.timed("mapping"):
+            data = plan.project(values)
 
         # data.append(main_mapped)
 
         # ------------------------------------------------------------------ #
-        # 7. Related words (optional)
+        # 4. Related words (optional)
         # ------------------------------------------------------------------ #
         # if config.get("include_related_words", False):
         #     related_div = soup.find("div", class_="grp-tab-content-algo")
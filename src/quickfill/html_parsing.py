@@ -0,0 +1,79 @@
+"""
+HTML parsing helpers for the web fetchers.
+
+Honours the "parser" setting of a source's config and lets fetchers restrict
+parsing to the parts of a page they actually read, which saves most of the
+parse time and memory on large result pages.  bs4 (and lxml, if used) are
+imported on first use so loading the add-on stays cheap.
+"""
+import importlib.util
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSER = "html.parser"
+
+# Parser name -> module that must be importable for BeautifulSoup to use it
+_PARSER_MODULES = {
+    "lxml": "lxml",
+    "lxml-xml": "lxml",
+    "xml": "lxml",
+    "html5lib": "html5lib",
+}
+
+# Builders that ignore parse_only
+_NO_STRAINER = {"html5lib"}
+
+
+def resolve_parser(parser):
+    """Return parser if its backend is installed, else the stdlib parser."""
+    parser = parser or DEFAULT_PARSER
+    module = _PARSER_MODULES.get(parser)
+    if module and importlib.util.find_spec(module) is None:
+        logger.warning("Parser '%s' is not installed, using '%s'", parser, DEFAULT_PARSER)
+        return DEFAULT_PARSER
+    return parser
+
+
+def has_class(*names):
+    """
+    Attribute matcher for SoupStrainer that matches any of the CSS classes.
+
+    While parsing, bs4 hands strainers the raw class string
+    ("x dictionaryWordCard"), so plain class_="..." matching would miss
+    multi-class tags.
+    """
+    wanted = set(names)
+
+    def match(value):
+        if not value:
+            return False
+        tokens = value.split() if isinstance(value, str) else value
+        return not wanted.isdisjoint(tokens)
+    return match
+
+
+def strainer(name=None, **attrs):
+    """Build a SoupStrainer (see has_class() for matching on classes)."""
+    from bs4 import SoupStrainer
+    return SoupStrainer(name, **attrs)
+
+
+def make_soup(markup, parser=DEFAULT_PARSER, parse_only=None):
+    """
+    Parse markup with the configured parser.
+
+    Args:
+        markup (str): HTML text.
+        parser (str): BeautifulSoup parser name, e.g. "html.parser" or "lxml".
+        parse_only (SoupStrainer): If given, only matching tags and their
+            descendants are built.
+
+    Returns:
+        BeautifulSoup: The parsed document.
+    """
+    from bs4 import BeautifulSoup
+    parser = resolve_parser(parser)
+    if parser in _NO_STRAINER:
+        parse_only = None
+    return BeautifulSoup(markup, parser, parse_only=parse_only)
@@ -0,0 +1,97 @@
+"""
+Shared HTTP session for web fetchers.
+
+All web lookups go through one requests.Session so back-to-back lookups
+reuse keep-alive connections instead of paying a TCP+TLS handshake each
+time.  Requests are paced per host by rate_limiter.scheduler.  Use
+Fetcher.http_get() rather than calling this module directly.
+"""
+import threading
+
+from .rate_limiter import DEFAULT_LIMITS, scheduler
+
+DEFAULT_SETTINGS = {
+    "connect_timeout": 5,     # seconds
+    "read_timeout": 10,       # seconds
+    "pool_connections": 8,    # number of per-host pools kept
+    "pool_maxsize": 8,        # keep-alive connections per host
+    "hosts": {},              # per-host overrides, e.g. {"dictionary.cambridge.org": {"pool_maxsize": 16}}
+    # Pacing, see rate_limiter.DEFAULT_LIMITS; max_concurrency defaults to pool_maxsize
+    **{k: v for k, v in DEFAULT_LIMITS.items() if k != "max_concurrency"},
+}
+
+DEFAULT_HEADERS = {
+    "User-Agent":
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+}
+
+_settings = dict(DEFAULT_SETTINGS)
+_session = None
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    """Update session settings; the session is rebuilt on next use."""
+    global _session
+    with _lock:
+        _settings.update({k: v for k, v in settings.items() if v is not None})
+        if _session is not None:
+            _session.close()
+            _session = None
+        limits = {k: _settings[k] for k in DEFAULT_LIMITS if k in _settings}
+        limits.setdefault("max_concurrency", _settings["pool_maxsize"])
+        hosts = {host: {"max_concurrency": overrides["pool_maxsize"], **overrides}
+                 if "pool_maxsize" in overrides else overrides
+                 for host, overrides in _settings["hosts"].items()}
+        scheduler.configure(limits, hosts)
+
+
+def _accept_encoding():
+    # urllib3 only decodes brotli when a brotli module is installed
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            pass
+    return "gzip, deflate"
+
+
+def get_session():
+    """Return the shared session, creating it on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            # Imported here so loading the add-on doesn't pull in requests
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            session.headers["Accept-Encoding"] = _accept_encoding()
+
+            adapter = HTTPAdapter(pool_connections=_settings["pool_connections"],
+                                  pool_maxsize=_settings["pool_maxsize"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            for host, overrides in _settings["hosts"].items():
+                host_adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=overrides.get("pool_maxsize", _settings["pool_maxsize"]))
+                session.mount(f"https://{host}/", host_adapter)
+                session.mount(f"http://{host}/", host_adapter)
+            _session = session
+        return _session
+
+
+def timeout():
+    """Return the configured (connect, read) timeout pair."""
+    return (_settings["connect_timeout"], _settings["read_timeout"])
+
+
+def get(url, **kwargs):
+    """GET url on the shared session with the configured timeouts, paced and retried per host."""
+    kwargs.setdefault("timeout", timeout())
+    return scheduler.request(url, lambda: get_session().get(url, **kwargs))
@@ -0,0 +1,185 @@
+"""
+Background download of remote media referenced by fetched fields.
+
+Fetchers put remote files in fields as sound tags holding the URL, e.g.
+"[sound:https://example.org/word.mp3]".  MediaDownloader.localize() swaps
+each for a tag naming a local copy in the collection's media folder,
+downloading the copies in parallel over the shared HTTP session and saving
+them through the collection's media manager (which normalizes the names and
+keeps track of the files).
+
+Files are named after their URL (original name plus a short URL hash), so a
+URL that was downloaded before, in this session or an earlier one, is not
+fetched again, and concurrent requests for one URL share one download.
+Downloads whose content matches a file the add-on already saved reuse that
+file instead of adding a duplicate; earlier sessions' files are only hashed
+when a download has the same size.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from . import http_session
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+# Remote sound tags, as produced by fetchers (Anki only plays local files)
+REMOTE_SOUND = re.compile(r"\[sound:(https?://[^\]]+)\]")
+
+
+def sound_tag(url):
+    """Return the field markup a fetcher uses for a remote audio file."""
+    return f"[sound:{url}]"
+
+
+def media_filename(url, prefix="qf_"):
+    """Stable, filesystem-safe media file name for a URL."""
+    path = urllib.parse.urlsplit(url).path
+    stem, ext = os.path.splitext(os.path.basename(path))
+    stem = re.sub(r"[^\w.-]", "_", stem)[:40] or "media"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return f"{prefix}{stem}_{digest}{ext.lower() or '.mp3'}"
+
+
+class MediaDownloader:
+    """
+    Downloads remote media into a collection's media folder.
+
+    Args:
+        media (callable): Returns the collection's media manager
+            (col.media), or None while no collection is open.
+        max_workers (int): Parallel downloads.
+    """
+
+    def __init__(self, media, max_workers=DEFAULT_WORKERS):
+        self._media = media
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.RLock()
+        self._pending = {}   # file name -> Future of the name finally used, while running
+        self._by_hash = {}   # sha1 of content -> file name, for our files in the media folder
+        self._by_size = {}   # media folder -> {size: [names not hashed yet]}, from earlier sessions
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix="quickfill-media")
+            return self._executor
+
+    def localize(self, data):
+        """
+        Replace remote sound tags in a {field_idx: value} dict with local
+        ones, downloading what is missing.  Blocks until those downloads
+        finish, so call it off the main thread.  Tags whose download fails
+        are dropped.
+        """
+        urls = {url for value in data.values() if isinstance(value, str)
+                for url in REMOTE_SOUND.findall(value)}
+        if not urls:
+            return data
+        media = self._media()
+        if media is None:
+            logger.warning("No collection open, dropping %s media links", len(urls))
+            names = {}
+        else:
+            futures = {url: self.download(url, media) for url in urls}
+            names = {}
+            for url, future in futures.items():
+                try:
+                    names[url] = future.result()
+                except Exception as e:
+                    logger.warning("Could not download %s: %s", url, e)
+
+        def replace(match):
+            name = names.get(match.group(1))
+            return f"[sound:{name}]" if name else ""
+
+        return {idx: REMOTE_SOUND.sub(replace, value) if isinstance(value, str) else value
+                for idx, value in data.items()}
+
+    def download(self, url, media):
+        """
+        Start downloading url into the media manager's folder unless it is
+        already there or on its way.
+
+        Returns:
+            Future: Resolves to the media file name to reference.
+        """
+        name = media_filename(url)
+        with self._lock:
+            future = self._pending.get(name)
+            if future is None:
+                future = self._get_executor().submit(self._fetch, url, media, name)
+                self._pending[name] = future
+                future.add_done_callback(lambda f: self._forget(name))
+            return future
+
+    def _forget(self, name):
+        with self._lock:
+            self._pending.pop(name, None)
+
+    def _fetch(self, url, media, name):
+        media_dir = media.dir()
+        if os.path.exists(os.path.join(media_dir, name)):
+            return name
+        with metrics.timer("media", "network"):
+            resp = http_session.get(url)
+            resp.raise_for_status()
+            content = resp.content
+        digest = hashlib.sha1(content).hexdigest()
+        # Hashing earlier files reads them, so it happens outside the lock
+        self._hash_same_size(media_dir, len(content))
+        # Check and write under the lock, so two URLs serving the same file
+        # at once still end up as one file
+        with self._lock:
+            existing = self._by_hash.get(digest)
+            if existing and os.path.exists(os.path.join(media_dir, existing)):
+                return existing
+            name = media.write_data(name, content)
+            self._by_hash[digest] = name
+        logger.debug("Downloaded %s to %s", url, name)
+        return name
+
+    def _hash_same_size(self, media_dir, size, prefix="qf_"):
+        """
+        Hash the files saved by earlier sessions that have this size, so a
+        download can be matched against them.  The folder is listed once.
+        """
+        with self._lock:
+            sizes = self._by_size.get(media_dir)
+        if sizes is None:
+            sizes = {}
+            with os.scandir(media_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.is_file():
+                        sizes.setdefault(entry.stat().st_size, []).append(entry.name)
+            with self._lock:
+                sizes = self._by_size.setdefault(media_dir, sizes)
+        with self._lock:
+            names = list(sizes.get(size, ()))
+        # Dropped from the list only once hashed, so a concurrent download
+        # of the same size can't miss them
+        for name in names:
+            try:
+                with open(os.path.join(media_dir, name), "rb") as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                digest = None
+            with self._lock:
+                if digest:
+                    self._by_hash.setdefault(digest, name)
+                if name in sizes.get(size, ()):
+                    sizes[size].remove(name)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
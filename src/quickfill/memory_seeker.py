@@ -0,0 +1,172 @@
+"""
+In-memory dictionary mode for CSVSeeker.
+
+Small and medium dictionaries can be held entirely in RAM: the raw file as
+one bytes buffer plus a compact sorted (key -> row offset) index built over
+it.  Rows are only parsed when a lookup returns them, so memory stays close
+to the file size (far below a dict per row) and lookups never touch disk.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+
+from .compressed_csv import open_source
+from .csv_index import (LemmaIndex, SortedOffsetIndex, TrigramIndex, iter_buffer_records,
+                        normalize_key, parse_line)
+from .csv_seeker import CSVSeeker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Every FENCE_STEP-th key is also kept in a Python list, so most of a
+# lookup's binary search runs in C and only the last few steps touch the
+# packed index
+FENCE_STEP = 64
+
+
+class InMemorySeeker(CSVSeeker):
+    """CSVSeeker that answers lookups from a copy of the file held in memory."""
+
+    def __init__(self, csv_path, search_field, delimiter="\t"):
+        super().__init__(csv_path, search_field, sorted=True, delimiter=delimiter, use_index=False)
+        key_idx = self.header.index(self.search_field)
+        with open_source(self.csv_path) as f:
+            self._data = f.read()
+        meta = {"kind": SortedOffsetIndex.kind, "field": self.search_field,
+                "delimiter": self.delimiter, "stamp": self.stamp}
+        self._index = SortedOffsetIndex.from_records(
+            iter_buffer_records(self._data, key_idx, self.delimiter), meta)
+        self._fence = [bytes(self._index.key_at(i)) for i in range(0, len(self._index), FENCE_STEP)]
+        self._fence_bytes = sys.getsizeof(self._fence) + sum(map(sys.getsizeof, self._fence))
+        self._trigrams = None  # built on the first fuzzy suggestion
+        self._lemmas = {}  # variants field -> LemmaIndex, built on first use
+
+    @classmethod
+    def load(cls, csv_path, search_field, delimiter="\t", max_bytes=DEFAULT_MEMORY_LIMIT):
+        """
+        Load a CSV into memory, or return None if it would need more than
+        max_bytes (or can't be indexed), so the caller can use CSVSeeker.
+        """
+        try:
+            # The buffer alone is the file's (uncompressed) size: don't read
+            # a file that can't fit only to throw it away
+            with open_source(csv_path) as f:
+                size = f.seek(0, os.SEEK_END)
+            if size > max_bytes:
+                logger.info("%s is %s bytes (memory limit %s), using on-disk lookups",
+                            csv_path, size, max_bytes)
+                return None
+            seeker = cls(csv_path, search_field, delimiter=delimiter)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load %s into memory: %s", csv_path, e)
+            return None
+        except MemoryError:
+            logger.warning("Out of memory loading %s", csv_path)
+            return None
+        if seeker.memory_usage() > max_bytes:
+            logger.info("%s needs %s bytes in memory (limit %s), using on-disk lookups",
+                        csv_path, seeker.memory_usage(), max_bytes)
+            seeker.close()
+            return None
+        return seeker
+
+    def memory_usage(self):
+        """Bytes held by the file buffer and its index."""
+        if self._index is None:
+            return 0
+        # Copies: the background trigram build may swap these meanwhile
+        extra = sum(index.nbytes for index in list(self._lemmas.values()))
+        trigrams = self._trigrams
+        if trigrams is not None:
+            extra += trigrams.nbytes
+        return len(self._data) + self._index.nbytes + self._fence_bytes + extra
+
+    def close(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            if self._trigrams is not None:
+                self._trigrams.close()
+                self._trigrams = None
+            for index in self._lemmas.values():
+                index.close()
+            self._lemmas = {}
+            self._data = b""
+            self._fence = []
+        super().close()
+
+    def search_many(self, words):
+        """
+        Look up many words by bisecting the fence list, then the packed index.
+
+        Returns:
+            dict: word -> list of matching rows (empty list for misses).
+        """
+        results = {word: [] for word in words}
+        key_idx = self.header.index(self.search_field)
+        with self._lock:
+            data, index = self._data, self._index
+            if index is None:
+                return results
+            fence = self._fence
+            for target in {normalize_key(w) for w in results}:
+                # The first entry >= target lies after fence[f - 1], up to fence[f]
+                f = bisect.bisect_left(fence, target)
+                lo = (f - 1) * FENCE_STEP + 1 if f else 0
+                hi = min(f * FENCE_STEP, len(index))
+                for offset in index.lookup(target, lo, hi):
+                    end = data.find(b'\n', offset)
+                    row = parse_line(data[offset:len(data) if end < 0 else end + 1], self.delimiter)
+                    if key_idx < len(row) and row[key_idx] in results:
+                        results[row[key_idx]].append(row)
+        return results
+
+    def _suggest_index(self):
+        return self._index
+
+    def _trigram_index(self):
+        # Built in the background like CSVSeeker's; prefix suggestions only
+        # until it is ready
+        with self._lock:
+            if self._trigrams is None and self._index is not None and not self._building:
+                self._building.add(TrigramIndex.kind)
+                threading.Thread(target=self._build_trigrams, args=(self._data,),
+                                 name="quickfill-index", daemon=True).start()
+            return self._trigrams
+
+    def _build_trigrams(self, data):
+        key_idx = self.header.index(self.search_field)
+        meta = {"kind": TrigramIndex.kind, "field": self.search_field,
+                "delimiter": self.delimiter, "stamp": self.stamp}
+        try:
+            trigrams = TrigramIndex.from_records(iter_buffer_records(data, key_idx, self.delimiter), meta)
+        except BaseException:
+            # Logged like CSVSeeker's; the next fuzzy suggestion tries again
+            logger.exception("Building the %s index for %s failed", TrigramIndex.kind, self.csv_path)
+            trigrams = None
+        with self._lock:
+            self._building.discard(TrigramIndex.kind)
+            if trigrams is not None and self._index is None:  # closed meanwhile
+                trigrams.close()
+            elif trigrams is not None:
+                self._trigrams = trigrams
+
+    def _lemma_index(self, field):
+        with self._lock:
+            if field not in self._lemmas and self._index is not None:
+                if field not in self.header:
+                    logger.warning("Field '%s' not in header of %s", field, self.csv_path)
+                    return None
+                meta = {"kind": LemmaIndex.kind, "field": field,
+                        "delimiter": self.delimiter, "stamp": self.stamp}
+                self._lemmas[field] = LemmaIndex.from_records(
+                    iter_buffer_records(self._data, self.header.index(field), self.delimiter), meta)
+            return self._lemmas.get(field)
+
+    def _line_at_offset(self, offset):
+        end = self._data.find(b'\n', offset)
+        return self._data[offset:len(self._data) if end < 0 else end]
@@ -0,0 +1,102 @@
+"""
+Per-fetcher latency metrics.
+
+Timings are recorded per (fetcher, stage) into a fixed-size window of the
+most recent samples, so percentiles reflect current behaviour and memory
+stays bounded however long Anki runs.  Stages used by the add-on:
+
+    fetch    whole lookup as seen by the registry (cache hits included)
+    queue    waiting for a host's rate limit (recorded per host)
+    network  HTTP round trip and body download
+    parse    HTML parsing and extraction
+    lookup   local dictionary search
+    suggest  headword suggestions for a missed or partial word
+    mapping  turning a result into note fields
+    reload   applying the fields and reloading the editor
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_WINDOW = 500
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted, non-empty sequence."""
+    rank = max(1, -(-pct * len(sorted_samples) // 100))
+    return sorted_samples[rank - 1]
+
+
+class Metrics:
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._samples = {}  # (fetcher, stage) -> deque of seconds
+        self._counts = {}   # (fetcher, stage) -> samples ever recorded
+        self._lock = threading.Lock()
+
+    def record(self, fetcher, stage, seconds):
+        key = (fetcher, stage)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    @contextmanager
+    def timer(self, fetcher, stage):
+        """Time the enclosed block and record it, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(fetcher, stage, time.perf_counter() - start)
+
+    def summary(self):
+        """
+        Return {fetcher: {stage: stats}} where stats holds the total sample
+        count and the mean, percentiles and max (in ms) of the window.
+        """
+        with self._lock:
+            snapshot = {key: (sorted(samples), self._counts[key])
+                        for key, samples in self._samples.items()}
+        result = {}
+        for (fetcher, stage), (samples, count) in sorted(snapshot.items()):
+            stats = {"count": count,
+                     "mean_ms": round(1000 * sum(samples) / len(samples), 3)}
+            for pct in PERCENTILES:
+                stats[f"p{pct}_ms"] = round(1000 * percentile(samples, pct), 3)
+            stats["max_ms"] = round(1000 * samples[-1], 3)
+            result.setdefault(fetcher, {})[stage] = stats
+        return result
+
+    def format_report(self):
+        """Plain-text table of summary() for display."""
+        summary = self.summary()
+        if not summary:
+            return "No QuickFill lookups recorded yet."
+        columns = ["count", "mean_ms"] + [f"p{pct}_ms" for pct in PERCENTILES] + ["max_ms"]
+        lines = [f"{'fetcher / stage':<28}" + "".join(f"{c:>10}" for c in columns)]
+        for fetcher, stages in summary.items():
+            lines.append(fetcher)
+            for stage, stats in stages.items():
+                lines.append(f"  {stage:<26}" + "".join(f"{stats[c]:>10}" for c in columns))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write summary() to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "window": self.window,
+                       "fetchers": self.summary()}, f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,221 @@
+"""
+Offline mirror of web sources for a known word list.
+
+crawl() looks a word list up through one source ahead of time and stores
+the results in a local SQLite file (user_files/mirror.sqlite3).  Unlike the
+response cache, the mirror never expires or evicts anything.
+FetcherRegistry checks it before the cache and the network, so mirrored
+words fill without touching the network.
+
+Entries use the response cache's key (fetcher, word, source config), so
+changing a source's mapping makes its mirrored entries unused; crawl the
+list again to refresh them.  Crawls are resumable: results are committed
+every CHECKPOINT_EVERY words and words already mirrored are skipped, so
+an interrupted crawl picks up where it stopped.
+
+Command line (outside Anki):
+
+    python -m quickfill.mirror words.txt --config config.json --model "Basic" --source "Cambridge EC"
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .response_cache import ResponseCache, decode_result, encode_result, normalize_word
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_EVERY = 50
+DEFAULT_WORKERS = 4
+
+
+def read_words(path):
+    """
+    Read a word list: one word per line, or a TSV whose first column
+    holds the word.  Blank lines, # comments and repeats are skipped.
+    """
+    words = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            word = line.split("\t")[0].strip()
+            if word and not word.startswith("#"):
+                words.setdefault(normalize_word(word), word)
+    return list(words.values())
+
+
+class Mirror:
+    """SQLite store of {field_idx: value} results, keyed like ResponseCache."""
+
+    make_key = staticmethod(ResponseCache.make_key)
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " fetcher TEXT NOT NULL,"
+            " word TEXT NOT NULL,"
+            " stored REAL NOT NULL,"
+            " data BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_fetcher_word ON entries(fetcher, word)")
+        self._db.commit()
+
+    def get(self, key):
+        """Return the mirrored result for a key, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+        return decode_result(row[0]) if row else None
+
+    def keys(self, fetcher):
+        """Return the set of keys mirrored for a fetcher."""
+        with self._lock:
+            return {key for key, in self._db.execute("SELECT key FROM entries WHERE fetcher = ?", (fetcher,))}
+
+    def put_many(self, entries):
+        """Store (key, fetcher, word, data) tuples in one transaction."""
+        now = time.time()
+        rows = [(key, fetcher, normalize_word(word), now, encode_result(data))
+                for key, fetcher, word, data in entries]
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def crawl(mirror, words, plan, fetch, version=0, workers=DEFAULT_WORKERS, progress=None, cancelled=None):
+    """
+    Look words up through one source and store the results in mirror.
+
+    Args:
+        mirror (Mirror): Where results are stored.
+        words (list): Words to mirror.
+        plan (SourcePlan): The source to crawl.
+        fetch (callable): fetch(word) -> (data, messages), e.g. a
+            FetcherRegistry's fetch_quietly bound to plan.
+        version (int): The fetcher's cache_version.
+        workers (int): Lookups run in parallel.
+        progress (callable): Called as progress(done, total) from the crawling thread.
+        cancelled (callable): Polled between lookups; True stops the crawl
+            after a checkpoint.
+
+    Returns:
+        dict: Counts of "stored", "skipped" (already mirrored), "empty"
+        (no entry found) and "failed" words; "stopped" is True if cancelled.
+    """
+    existing = mirror.keys(plan.fetcher)
+    todo = []
+    for word in words:
+        key = mirror.make_key(plan.fetcher, word, plan, version)
+        if key not in existing:
+            todo.append((word, key))
+    counts = {"stored": 0, "skipped": len(words) - len(todo), "empty": 0, "failed": 0, "stopped": False}
+    total = len(todo)
+    batch = []
+    done = 0
+
+    # Only a few lookups are queued at a time, so memory stays bounded and
+    # cancelling doesn't have to drain a long queue
+    pending = {}
+    queue = iter(todo)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="quickfill-mirror") as executor:
+            def refill():
+                while len(pending) < 2 * workers and not counts["stopped"]:
+                    item = next(queue, None)
+                    if item is None:
+                        return
+                    pending[executor.submit(fetch, item[0])] = item
+
+            refill()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    word, key = pending.pop(future)
+                    done += 1
+                    try:
+                        data, messages = future.result()
+                    except Exception as e:
+                        logger.warning("Mirroring '%s' failed: %s", word, e)
+                        counts["failed"] += 1
+                        continue
+                    if data:
+                        batch.append((key, plan.fetcher, word, data))
+                        counts["stored"] += 1
+                    else:
+                        logger.debug("No entry for '%s': %s", word, messages)
+                        counts["empty"] += 1
+                if len(batch) >= CHECKPOINT_EVERY:
+                    mirror.put_many(batch)
+                    batch = []
+                if progress:
+                    progress(done, total)
+                if cancelled and cancelled():
+                    counts["stopped"] = True
+                refill()
+    finally:
+        # Keep what was fetched even if the crawl is interrupted
+        mirror.put_many(batch)
+    return counts
+
+
+def main(argv=None):
+    from .cli import load_config, open_registry, select_source
+
+    ap = argparse.ArgumentParser(description="Mirror a word list from a QuickFill source for offline use.")
+    ap.add_argument("words", help="word list: one word per line, or a TSV with the word first")
+    ap.add_argument("--config", required=True, help="the add-on's config.json (or meta.json)")
+    ap.add_argument("--model", required=True, help="note type whose source to use")
+    ap.add_argument("--source", help="source name (default: the note type's first source)")
+    ap.add_argument("--db", help="mirror file (default: user_files/mirror.sqlite3 next to the config)")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = ap.parse_args(argv)
+
+    config = load_config(args.config)
+    registry = open_registry(config, args.config, mirror=False)
+    plan = select_source(registry, config, args.model, args.source)
+    fetcher = registry.get_fetcher(plan.fetcher)
+    if fetcher is None:
+        raise SystemExit(f"Unknown fetcher '{plan.fetcher}'")
+
+    db_path = args.db or os.path.join(os.path.dirname(os.path.abspath(args.config)), "user_files", "mirror.sqlite3")
+    words = read_words(args.words)
+    mirror = Mirror(db_path)
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr)
+
+    try:
+        counts = crawl(mirror, words, plan, lambda word: registry.fetch_quietly(word, plan),
+                       fetcher.cache_version, workers=args.workers, progress=progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again to resume", file=sys.stderr)
+        return 130
+    finally:
+        mirror.close()
+        if registry.cache is not None:
+            registry.cache.close()
+    print(f"\n{counts['stored']} stored, {counts['skipped']} already mirrored, "
+          f"{counts['empty']} not found, {counts['failed']} failed -> {db_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Speculative prefetch for editor fills.
+
+When enabled, a lookup for the note type's selected source starts shortly
+after the source field is edited or left, so that pressing QuickFill can
+apply the result straight away.  Each editor has a single slot; editing the
+word again replaces the pending prefetch and cancels it if it hasn't started.
+"""
+import logging
+import weakref
+
+from aqt.qt import QTimer
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Per-editor debounced prefetch slots backed by the registry's executor."""
+
+    def __init__(self, registry, source_for_model, delay_ms=400):
+        self.registry = registry
+        self.source_for_model = source_for_model
+        self.delay_ms = delay_ms
+        self._editors = weakref.WeakValueDictionary()  # id(note) -> editor
+        # Keyed weakly by editor, so a closed editor's slot (and the data its
+        # future holds) goes away with it
+        self._slots = weakref.WeakKeyDictionary()   # editor -> (word, source, future)
+        self._tokens = weakref.WeakKeyDictionary()  # editor -> debounce token
+
+    def track(self, editor):
+        """Remember which editor shows a note (the field hooks only pass the note)."""
+        if editor.note is not None:
+            self._editors[id(editor.note)] = editor
+
+    def note_changed(self, note):
+        """Schedule a prefetch if the note's source field holds a new word."""
+        editor = self._editors.get(id(note))
+        if editor is None or editor.note is not note:
+            return
+        source = self.source_for_model(note.note_type()["name"])
+        if not source:
+            return
+        field_idx = source.get("source_field", 0)
+        if field_idx >= len(note.fields):
+            return
+        word = note.fields[field_idx].strip()
+
+        slot = self._slots.get(editor)
+        if slot and slot[0] == word and slot[1] is source:
+            return
+        self._drop(editor)
+        if not word:
+            return
+
+        # Debounce: only the last edit within delay_ms starts a lookup
+        token = self._tokens.get(editor, 0) + 1
+        self._tokens[editor] = token
+        QTimer.singleShot(self.delay_ms, lambda: self._start(editor, token, word, source))
+
+    def _start(self, editor, token, word, source):
+        if self._tokens.get(editor) != token or editor.note is None:
+            return
+        logger.debug("Prefetching '%s' from %s", word, source.get('name', source['fetcher']))
+        self._slots[editor] = (word, source, self.registry.submit(word, source))
+
+    def _drop(self, editor):
+        self._tokens[editor] = self._tokens.get(editor, 0) + 1
+        slot = self._slots.pop(editor, None)
+        if slot:
+            slot[2].cancel()
+
+    def take(self, editor, word, source):
+        """
+        Claim the prefetch for (word, source) in this editor, if there is one.
+
+        Returns:
+            Future: Resolves to (data, messages), or None if nothing matches.
+        """
+        slot = self._slots.pop(editor, None)
+        if slot and slot[0] == word and slot[1] is source and not slot[2].cancelled():
+            return slot[2]
+        if slot:
+            slot[2].cancel()
+        return None
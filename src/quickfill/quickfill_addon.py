@@ -1,58 +1,276 @@
 from aqt import gui_hooks, mw
 from aqt.qt import QMenu, QAction, QIcon, QCursor
-from aqt.utils import tooltip, showWarning
+from aqt.utils import tooltip, showInfo, showText, showWarning
 from aqt.editor import Editor
+from aqt.operations import QueryOp
 from aqt.theme import theme_manager
+import html
+import logging
 import os
 from .fetcher import FetcherRegistry
+from .bulk_fill import bulk_fill
+from .seeker_pool import seeker_pool
+from . import http_session
+from .response_cache import ResponseCache
+from .prefetch import Prefetcher
+from .source_plan import SourcePlan
+from .media import DEFAULT_WORKERS, MediaDownloader
+from .metrics import metrics
+from .dictionary_tools import compile_dictionary, mirror_word_list
+from .mirror import Mirror
+
+logger = logging.getLogger(__name__)
 
 
 # Load config and icon
 CONFIG = mw.addonManager.getConfig(__name__)
+
+# Logging is off unless "log_level" (e.g. "DEBUG", "WARNING") is set
+_package_logger = logging.getLogger(__package__)
+_package_logger.propagate = False
+if CONFIG.get("log_level"):
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _package_logger.addHandler(_handler)
+    _level = str(CONFIG["log_level"]).upper()
+    if isinstance(logging.getLevelName(_level), int):
+        _package_logger.setLevel(_level)
+    else:
+        _package_logger.setLevel(logging.WARNING)
+        _package_logger.warning("Unknown log_level %r in config, using WARNING", CONFIG["log_level"])
+else:
+    _package_logger.addHandler(logging.NullHandler())
+
+_pool_config = CONFIG.get("csv_pool", {})
+seeker_pool.configure(
+    max_entries=_pool_config.get("max_entries"),
+    max_bytes=_pool_config["max_memory_mb"] * 1024 * 1024 if "max_memory_mb" in _pool_config else None,
+)
+http_session.configure(**CONFIG.get("http", {}))
 ICON_PATH = os.path.join(os.path.dirname(__file__), "images", "quickfill.svg")
 
 # Track selected source per note type
-_selected_source: dict[str, dict] = {}
+_selected_source: dict[str, SourcePlan] = {}
 
-quickfill = FetcherRegistry()
+# Latest fill started in each editor; older results are dropped on arrival
+_fill_generation: dict[int, int] = {}
 
-def on_setup_buttons(buttons: list, editor: Editor) -> list:
-    """Add two native buttons: Run Fill + Choose Source"""
+def _open_response_cache():
+    cache_config = CONFIG.get("cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+    path = os.path.join(os.path.dirname(__file__), "user_files", "response_cache.sqlite3")
+    return ResponseCache(
+        path,
+        max_bytes=cache_config.get("max_size_mb", 64) * 1024 * 1024,
+        default_ttl=cache_config.get("ttl_days", 30) * 86400,
+    )
 
-    # ——— Button 1: Run QuickFill using selected source ———
-    def run_fill(editor: Editor):
-        if not editor.note:
-            tooltip("No note open")
-            return
+def _open_mirror():
+    return Mirror(os.path.join(os.path.dirname(__file__), "user_files", "mirror.sqlite3"))
 
-        model_name = editor.note.model()["name"]
-        source_config = _selected_source.get(model_name)
+def _collection_media():
+    return mw.col.media if mw.col else None
 
-        if not source_config:
-            tooltip("No source selected — click the dropdown button")
-            return
+quickfill = FetcherRegistry(
+    cache=_open_response_cache(),
+    mirror=_open_mirror(),
+    message_callback=lambda msg: mw.taskman.run_on_main(lambda: showInfo(msg)),
+    media=MediaDownloader(_collection_media, CONFIG.get("media", {}).get("download_workers", DEFAULT_WORKERS)),
+)
 
-        field_idx = source_config.get("source_field", 0)
-        if field_idx >= len(editor.note.fields):
-            tooltip("Source field index out of range")
-            return
+# Source lists per note type, compiled into plans with combined sources resolved
+MODELS, CONFIG_ERRORS = quickfill.compile_models(CONFIG.get("models", {}))
+
+# Config problems are only logged at load (the shipped config has placeholder
+# paths); a source's own problems are shown the first time it is used
+_reported_plans: set[SourcePlan] = set()
 
-        word = editor.note.fields[field_idx].strip()
-        if not word:
-            tooltip("Source field is empty")
+def report_config_errors(plan: SourcePlan) -> None:
+    """Show a source's config problems, once per session."""
+    if not plan.errors or plan in _reported_plans:
+        return
+    _reported_plans.add(plan)
+    showWarning(f"QuickFill found problems in the config of '{plan.name}':\n\n" + "\n".join(plan.errors),
+                title="QuickFill")
+
+def _source_for_model(model_name: str):
+    """Return the selected source for a note type, defaulting to its first one."""
+    if model_name in _selected_source:
+        return _selected_source[model_name]
+    sources = MODELS.get(model_name, [])
+    return sources[0] if sources else None
+
+_prefetch_config = CONFIG.get("prefetch", {})
+prefetcher = (Prefetcher(quickfill, _source_for_model, _prefetch_config.get("delay_ms", 400))
+              if _prefetch_config.get("enabled", False) else None)
+
+def _set_busy(editor: Editor, busy: bool) -> None:
+    """Dim the QuickFill button while a lookup is in flight."""
+    if not editor.web:
+        return
+    opacity = "0.4" if busy else ""
+    editor.web.eval(
+        f"(b => b && (b.style.opacity = '{opacity}'))(document.getElementById('qf_run'))"
+    )
+
+def run_fill(editor: Editor):
+    if not editor.note:
+        tooltip("No note open")
+        return
+
+    model_name = editor.note.model()["name"]
+    source_config = _source_for_model(model_name)
+
+    if not source_config:
+        tooltip("No sources configured for this note type")
+        return
+    report_config_errors(source_config)
+
+    field_idx = source_config.get("source_field", 0)
+    if field_idx >= len(editor.note.fields):
+        tooltip("Source field index out of range")
+        return
+
+    word = editor.note.fields[field_idx].strip()
+    if not word:
+        tooltip("Source field is empty")
+        return
+
+    note = editor.note
+    generation = _fill_generation.get(id(editor), 0) + 1
+    _fill_generation[id(editor)] = generation
+    source_name = source_config.get('name', source_config['fetcher'])
+
+    def finish():
+        """End this fill; return True if its result still applies to the editor."""
+        if _fill_generation.get(id(editor)) != generation:
+            return False  # a newer fill has started and owns the busy state
+        _set_busy(editor, False)
+        return (editor.note is note
+                and field_idx < len(note.fields)
+                and note.fields[field_idx].strip() == word)
+
+    prefetched = prefetcher.take(editor, word, source_config) if prefetcher else None
+    if prefetched is not None and prefetched.done() and not prefetched.exception():
+        data, _messages = prefetched.result()
+        if data and finish():
+            with metrics.timer(source_config["fetcher"], "reload"):
+                quickfill.apply_data(note, data)
+                editor.loadNoteKeepingFocus()
+            tooltip(f"Filled using {source_name}")
             return
 
-        try:
-            # Use your existing fill_note() — no deck needed anymore
-            quickfill.fill_note(editor.note, word, source_config, editor)
+    def lookup(col):
+        if prefetched is not None:
+            try:
+                data, messages = prefetched.result()
+                if data:
+                    return data, messages, []
+            except Exception as e:
+                logger.warning("Prefetch for '%s' failed: %s", word, e)
+        data, messages = quickfill.fetch_quietly(word, source_config)
+        if data:
+            return data, messages, []
+        # A miss: offer close headwords instead of only saying so
+        suggestions = [s for s in quickfill.suggest(word, source_config) if s != word]
+        return data, messages, suggestions
+
+    def on_done(result):
+        data, messages, suggestions = result
+        if not finish():
+            logger.debug("Dropping stale QuickFill result for '%s'", word)
+            return
+        if not data:
+            if suggestions:
+                show_suggestion_menu(editor, field_idx, word, suggestions)
+            elif messages:
+                showInfo("\n".join(messages))
+            return
+        with metrics.timer(source_config["fetcher"], "reload"):
+            quickfill.apply_data(note, data)
             editor.loadNoteKeepingFocus()
-            tooltip(f"Filled using {source_config.get('name', source_config['fetcher'])}")
-        except Exception as e:
+        tooltip(f"Filled using {source_name}")
+
+    def on_failure(e):
+        if finish():
             showWarning(f"QuickFill failed:\n{e}")
 
+    # Only the lookup runs in the background; the note is updated on the main thread
+    _set_busy(editor, True)
+    tooltip(f"QuickFill: looking up '{word}' in {source_name}...")
+    QueryOp(
+        parent=editor.widget,
+        op=lookup,
+        success=on_done,
+    ).failure(on_failure).without_collection().run_in_background()
+
+
+def show_suggestion_menu(editor: Editor, field_idx: int, word: str, suggestions: list) -> None:
+    """Pop up suggested headwords; picking one replaces the word and fills the note."""
+    note = editor.note
+    menu = QMenu(editor.widget)
+    title = menu.addAction(f"No entry for '{word}'. Did you mean:")
+    title.setEnabled(False)
+    menu.addSeparator()
+    for suggestion in suggestions:
+        action = QAction(suggestion, menu)
+
+        def on_pick(*, s=suggestion):
+            if editor.note is not note or field_idx >= len(note.fields):
+                return
+            note.fields[field_idx] = s
+            editor.loadNoteKeepingFocus()
+            run_fill(editor)
+
+        action.triggered.connect(on_pick)
+        menu.addAction(action)
+    menu.exec(QCursor.pos())
+
+
+def show_suggestions(editor: Editor):
+    """Suggest headwords for the (partial) word in the source field."""
+    if not editor.note:
+        tooltip("No note open")
+        return
+    source_config = _source_for_model(editor.note.model()["name"])
+    if not source_config:
+        tooltip("No sources configured for this note type")
+        return
+    report_config_errors(source_config)
+    field_idx = source_config.get("source_field", 0)
+    if field_idx >= len(editor.note.fields):
+        tooltip("Source field index out of range")
+        return
+    word = editor.note.fields[field_idx].strip()
+    if not word:
+        tooltip("Source field is empty")
+        return
+    note = editor.note
+
+    def on_done(suggestions):
+        if editor.note is not note:
+            return
+        if not suggestions:
+            tooltip(f"No suggestions for '{word}'")
+            return
+        show_suggestion_menu(editor, field_idx, word, suggestions)
+
+    QueryOp(
+        parent=editor.widget,
+        op=lambda col: quickfill.suggest(word, source_config),
+        success=on_done,
+    ).without_collection().run_in_background()
+
+
+def on_setup_buttons(buttons: list, editor: Editor) -> list:
+    """Add two native buttons: Run Fill + Choose Source"""
+
+    # ——— Button 1: Run QuickFill using selected source ———
     run_btn_html = editor.addButton(
         icon=ICON_PATH if os.path.exists(ICON_PATH) else None,
         cmd="qf_run",
+        id="qf_run",
         func=lambda e=editor: run_fill(e),
         tip="QuickFill: Fill fields from selected source",
         keys="Ctrl+Shift+Q",
@@ -69,7 +287,7 @@ def on_setup_buttons(buttons: list, editor: Editor) -> list:
             return
 
         model_name = editor.note.model()["name"]
-        sources = CONFIG.get("models", {}).get(model_name, [])
+        sources = MODELS.get(model_name, [])
 
         if not sources:
             tooltip("No sources configured for this note type")
@@ -121,4 +339,59 @@ def on_setup_buttons(buttons: list, editor: Editor) -> list:
     return buttons
 
 
+def on_setup_shortcuts(shortcuts: list, editor: Editor) -> None:
+    shortcuts.append(("Ctrl+Alt+Q", lambda: show_suggestions(editor)))
+
+
+def on_browser_menus(browser) -> None:
+    """Add a Notes menu action that QuickFills every selected note."""
+    action = QAction("QuickFill Selected Notes", browser)
+    action.triggered.connect(
+        lambda: bulk_fill(browser, quickfill, _source_for_model, CONFIG.get("bulk_workers", 4))
+    )
+    browser.form.menu_Notes.addSeparator()
+    browser.form.menu_Notes.addAction(action)
+
+
+def show_metrics():
+    showText(f"<pre>{html.escape(metrics.format_report())}</pre>", parent=mw,
+             type="html", title="QuickFill Metrics", copyBtn=True)
+
+def dump_metrics():
+    user_files = os.path.join(os.path.dirname(__file__), "user_files")
+    os.makedirs(user_files, exist_ok=True)
+    path = os.path.join(user_files, "metrics.json")
+    try:
+        metrics.dump(path)
+    except OSError as e:
+        showWarning(f"Could not save QuickFill metrics:\n{e}")
+        return
+    tooltip(f"QuickFill metrics saved to {path}")
+
+def _add_tools_action(label, callback):
+    action = QAction(label, mw)
+    action.triggered.connect(callback)
+    tools_menu.addAction(action)
+
+# Tools → QuickFill
+tools_menu = mw.form.menuTools.addMenu("QuickFill")
+_add_tools_action("Show Lookup Metrics", show_metrics)
+_add_tools_action("Save Lookup Metrics to JSON", dump_metrics)
+tools_menu.addSeparator()
+_add_tools_action("Compile CSV Dictionary...", lambda: compile_dictionary(MODELS))
+_add_tools_action("Mirror Word List for Offline Use...",
+                  lambda: mirror_word_list(quickfill, MODELS, CONFIG.get("bulk_workers", 4)))
+
 gui_hooks.editor_did_init_buttons.append(on_setup_buttons)
+gui_hooks.editor_did_init_shortcuts.append(on_setup_shortcuts)
+gui_hooks.browser_menus_did_init.append(on_browser_menus)
+
+def on_unfocus_field(changed, note, field_idx):
+    """Filter hook: start a prefetch for the note, passing changed through."""
+    prefetcher.note_changed(note)
+    return changed
+
+if prefetcher:
+    gui_hooks.editor_did_load_note.append(prefetcher.track)
+    gui_hooks.editor_did_fire_typing_timer.append(prefetcher.note_changed)
+    gui_hooks.editor_did_unfocus_field.append(on_unfocus_field)
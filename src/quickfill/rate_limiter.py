@@ -0,0 +1,228 @@
+"""
+Per-host pacing for web requests.
+
+Every request to a host passes through that host's HostLimiter, which
+
+- spaces requests with a token bucket (rate per second, with a burst),
+- caps requests in flight with an AIMD limit: +1 per round of fast
+  successes, halved on throttling, server errors or timeouts, and eased
+  off when latency climbs well above the host's best,
+- retries throttled (429/503), failed (5xx) and timed-out requests with
+  jittered exponential backoff, honouring Retry-After and pausing the whole
+  host for as long as it asks.
+
+Bulk fills then run as fast as a site tolerates instead of tripping its
+rate limits.  http_session.get() uses the module-level `scheduler`.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    "rate": 5.0,             # requests per second per host
+    "burst": 5,              # requests that may go out back to back
+    "max_concurrency": 8,    # upper bound of the adaptive in-flight limit
+    "max_retries": 3,
+    "backoff": 0.5,          # seconds; doubled per retry, with full jitter
+    "max_backoff": 30,       # seconds; longer Retry-After values aren't waited for
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+# Latency above this multiple of the host's best counts as congestion
+SLOW_FACTOR = 3
+# Weight of the newest sample in the latency average
+LATENCY_ALPHA = 0.2
+
+
+def retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delay or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class TokenBucket:
+    """Classic token bucket; take() blocks until a token is available."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take one token, sleeping as needed; return the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostLimiter:
+    """Token bucket, adaptive concurrency limit and pause state for one host."""
+
+    def __init__(self, host, limits):
+        self.host = host
+        self.limits = limits
+        self.bucket = TokenBucket(limits["rate"], limits["burst"])
+        self.max_concurrency = max(1, int(limits["max_concurrency"]))
+        self.limit = float(min(2, self.max_concurrency))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.best_latency = None
+        self.latency = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot, any pause and a token; return the seconds waited."""
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        self.bucket.take()
+        return time.monotonic() - start
+
+    def release(self, latency=None, congested=False):
+        """
+        Free a slot and adapt the limit: halve it on congestion, ease it
+        when latency drifts up, otherwise grow it by about one per round.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if congested:
+                self.limit = max(1.0, self.limit / 2)
+            elif latency is not None:
+                self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+                self.latency = latency if self.latency is None else (
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency)
+                if self.latency > SLOW_FACTOR * self.best_latency:
+                    self.limit = max(1.0, self.limit * 0.9)
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold back every request to this host for the given time."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Scheduler:
+    """Routes requests through per-host limiters, retrying where it makes sense."""
+
+    def __init__(self, limits=None, hosts=None):
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self.configure(limits, hosts)
+
+    def configure(self, limits=None, hosts=None):
+        """
+        Set the default limits and per-host overrides ({host: {key: value}});
+        existing limiters are replaced on next use.
+        """
+        with self._lock:
+            self.limits = {**DEFAULT_LIMITS, **{k: v for k, v in (limits or {}).items()
+                                                if k in DEFAULT_LIMITS and v is not None}}
+            self.hosts = hosts or {}
+            self._limiters = {}
+
+    def limiter(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                overrides = {k: v for k, v in self.hosts.get(host, {}).items() if k in DEFAULT_LIMITS}
+                limiter = self._limiters[host] = HostLimiter(host, {**self.limits, **overrides})
+            return limiter
+
+    def request(self, url, send):
+        """
+        Call send() (which performs the request for url and returns a
+        requests.Response) under the host's limits, retrying throttled,
+        failed and timed-out attempts.
+
+        Returns:
+            requests.Response: The last response; raise_for_status() is
+            left to the caller.
+        """
+        import requests
+
+        host = urllib.parse.urlsplit(url).hostname or ""
+        limiter = self.limiter(host)
+        limits = limiter.limits
+        attempt = 0
+        while True:
+            waited = limiter.acquire()
+            if waited > 0.001:
+                metrics.record(host, "queue", waited)
+            start = time.monotonic()
+            try:
+                resp = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                limiter.release(congested=True)
+                if attempt >= limits["max_retries"]:
+                    raise
+                delay = self._backoff(limits, attempt)
+                logger.debug("%s failed (%s), retry %s in %.2fs", url, e, attempt + 1, delay)
+            except BaseException:
+                # Anything else (bad URL, broken body, too many redirects)
+                # isn't retried, but must still give the slot back
+                limiter.release()
+                raise
+            else:
+                status = resp.status_code
+                if status not in RETRY_STATUS:
+                    limiter.release(time.monotonic() - start)
+                    return resp
+                limiter.release(congested=True)
+                delay = self._backoff(limits, attempt)
+                wait = retry_after(resp.headers.get("Retry-After"))
+                if wait is not None:
+                    if wait > limits["max_backoff"]:
+                        logger.warning("%s asks to wait %.0fs before retrying %s", host, wait, url)
+                        limiter.pause(wait)
+                        return resp
+                    delay = max(delay, wait)
+                if status in THROTTLE_STATUS:
+                    limiter.pause(delay)
+                if attempt >= limits["max_retries"]:
+                    return resp
+                logger.debug("%s returned %s, retry %s in %.2fs", url, status, attempt + 1, delay)
+                resp.close()
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _backoff(limits, attempt):
+        # Full jitter: spreads retries from parallel workers apart
+        return random.uniform(0, min(limits["max_backoff"], limits["backoff"] * 2 ** attempt))
+
+
+scheduler = Scheduler()
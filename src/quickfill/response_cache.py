@@ -0,0 +1,131 @@
+"""
+Persistent cache of web fetcher results.
+
+Results are stored zlib-compressed in a SQLite file in the add-on's
+user_files folder, keyed by (fetcher, normalized word, config hash), so a
+word that was looked up before comes back in milliseconds and also works
+offline.  Entries expire after a per-source TTL and the file is kept under
+a size cap by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+DEFAULT_TTL = 30 * 24 * 3600          # seconds
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_word(word):
+    """Normalize a lookup word for use in a cache key (case is preserved)."""
+    return " ".join(unicodedata.normalize("NFC", word).split())
+
+
+def config_hash(config, version=0):
+    """Hash the parts of a source config that affect a fetcher's result."""
+    relevant = {
+        "config": config.get("config", {}),
+        "mapping": config.get("mapping", {}),
+        "version": version,
+    }
+    # default=dict: plans hold their settings and mapping as read-only mappings
+    blob = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=dict).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()
+
+
+def encode_result(data):
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def decode_result(blob):
+    # JSON object keys are strings; note field indices are ints
+    return {int(k): v for k, v in json.loads(zlib.decompress(blob).decode("utf-8")).items()}
+
+
+class ResponseCache:
+    """SQLite-backed {field_idx: value} cache with TTL and LRU size cap."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " fetcher TEXT NOT NULL,"
+            " word TEXT NOT NULL,"
+            " stored REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " data BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(fetcher, word, config, version=0):
+        raw = f"{fetcher}\0{normalize_word(word)}\0{config_hash(config, version)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key, ttl=None):
+        """
+        Look up a cached result.
+
+        Returns:
+            tuple: (data, fresh) where data is None on a miss and fresh is
+            False when the entry is older than ttl.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stored, data FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, False
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        stored, blob = row
+        return decode_result(blob), now - stored <= ttl
+
+    def put(self, key, fetcher, word, data):
+        blob = encode_result(data)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, fetcher, word, stored, accessed, size, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fetcher, normalize_word(word), now, now, len(blob), blob))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,161 @@
+"""
+Process-wide pool of open CSVSeekers (and compiled SQLite dictionaries).
+
+Building a CSVSeeker reads the CSV header and, on first lookup, maps its
+sidecar index; an InMemorySeeker reads the whole file.  The pool keeps
+recently used seekers (with their open file handles and warm indexes)
+around between fills, drops them when the CSV changes on disk, and evicts
+the least recently used ones beyond a count or memory budget.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from .csv_seeker import CSVSeeker
+from .memory_seeker import DEFAULT_MEMORY_LIMIT, InMemorySeeker
+from .sqlite_dict import SQLiteDictionary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class SeekerPool:
+    """
+    LRU cache of CSVSeeker instances keyed by their lookup settings.
+
+    Seekers are leased (``with pool.lease(...) as seeker``) rather than
+    handed out: one that is evicted or goes stale while a lookup still uses
+    it is only closed when the last lease ends.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._seekers = OrderedDict()
+        self._leases = {}       # seeker -> number of lookups using it
+        self._retired = set()   # dropped from the pool, closed when the last lease ends
+        self._building = {}     # key -> lock held while that seeker is built
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries=None, max_bytes=None):
+        """Update the pool limits and evict anything now over budget."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max(1, int(max_entries))
+            if max_bytes is not None:
+                self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def lease(self, csv_path, search_field, sorted=True, delimiter="\t", use_index=True,
+              in_memory=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+        """
+        Lease a pooled seeker, creating (or refreshing) it as needed.
+
+        With in_memory=True the CSV is loaded into RAM if it fits within
+        memory_limit bytes; larger files fall back to on-disk lookups.
+
+        Returns:
+            A context manager yielding the seeker.
+        """
+        path = Path(csv_path).expanduser().resolve()
+        key = (str(path), search_field, delimiter, sorted, use_index, in_memory)
+
+        def build():
+            seeker = None
+            if in_memory:
+                seeker = InMemorySeeker.load(path, search_field, delimiter=delimiter, max_bytes=memory_limit)
+            if seeker is None:
+                seeker = CSVSeeker(path, search_field, sorted=sorted, delimiter=delimiter, use_index=use_index)
+            return seeker
+
+        return self._lease(key, build)
+
+    def lease_dictionary(self, db_path):
+        """Lease a pooled SQLiteDictionary for a compiled dictionary file."""
+        path = Path(db_path).expanduser().resolve()
+        return self._lease(("sqlite", str(path)), lambda: SQLiteDictionary(path))
+
+    @contextmanager
+    def _lease(self, key, build):
+        seeker = self._acquire(key, build)
+        try:
+            yield seeker
+        finally:
+            self._release(seeker)
+
+    def _acquire(self, key, build):
+        seeker = self._checkout(key)
+        if seeker is not None:
+            return seeker
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        # Build outside the pool lock, so loading a large file doesn't hold
+        # up lookups in other sources; threads wanting the same one wait here
+        with building:
+            seeker = self._checkout(key)
+            if seeker is not None:
+                return seeker
+            seeker = build()
+            with self._lock:
+                self._seekers[key] = seeker
+                self._leases[seeker] = 1
+                self._evict()
+            return seeker
+
+    def _checkout(self, key):
+        """Lease the pooled seeker for key if there is a current one."""
+        with self._lock:
+            seeker = self._seekers.get(key)
+            if seeker is None:
+                return None
+            if seeker.is_stale():
+                logger.debug("%s changed on disk, reopening", key[-1] if key[0] == "sqlite" else key[0])
+                del self._seekers[key]
+                self._retire(seeker)
+                return None
+            self._seekers.move_to_end(key)
+            self._leases[seeker] = self._leases.get(seeker, 0) + 1
+            return seeker
+
+    def _release(self, seeker):
+        with self._lock:
+            users = self._leases.pop(seeker) - 1
+            if users:
+                self._leases[seeker] = users
+            elif seeker in self._retired:
+                self._retired.discard(seeker)
+                seeker.close()
+
+    def _retire(self, seeker):
+        """Close a seeker dropped from the pool, or once its last lease ends."""
+        if seeker in self._leases:
+            self._retired.add(seeker)
+        else:
+            seeker.close()
+
+    def _evict(self):
+        # Never evict the most recently used seeker; it is about to be used.
+        while len(self._seekers) > 1:
+            over_count = len(self._seekers) > self.max_entries
+            over_bytes = sum(s.memory_usage() for s in self._seekers.values()) > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            _, seeker = self._seekers.popitem(last=False)
+            self._retire(seeker)
+
+    def clear(self):
+        """Drop every pooled seeker, closing each once it is no longer in use."""
+        with self._lock:
+            while self._seekers:
+                _, seeker = self._seekers.popitem(last=False)
+                self._retire(seeker)
+
+    def __len__(self):
+        return len(self._seekers)
+
+
+seeker_pool = SeekerPool()
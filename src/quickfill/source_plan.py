@@ -0,0 +1,166 @@
+"""
+Precompiled source configurations.
+
+Each source in config.json is compiled once, when the add-on loads, into a
+read-only SourcePlan.  A plan still reads like the source dict it came from
+(fetchers can keep calling config.get(...)), but it also holds the parts
+every fill needs, already checked and resolved:
+
+    fields      (mapping key, note field index) pairs, unmapped keys dropped
+    settings    the fetcher's own "config" block
+    columns()   (CSV column, note field index) pairs for a file header,
+                resolved once per distinct header
+
+Config problems (bad indices, missing files, unknown columns) are collected
+into plan.errors when the plan is built, so they are reported once instead
+of on every lookup.
+"""
+import copy
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from .compressed_csv import open_source
+
+logger = logging.getLogger(__name__)
+
+
+def _read_header(path, delimiter):
+    with open_source(path) as f:
+        return f.readline().decode("utf-8-sig", "replace").rstrip("\r\n").split(delimiter)
+
+
+class SourcePlan(Mapping):
+    """Read-only, precompiled view of one source config."""
+
+    def __init__(self, source, known_fetchers=None):
+        source = dict(source)
+        errors = []
+        self.name = source.get("name") or source.get("fetcher") or "unnamed source"
+        self.fetcher = source.get("fetcher")
+        if not self.fetcher:
+            errors.append("no \"fetcher\" given")
+        elif known_fetchers is not None and self.fetcher not in known_fetchers:
+            errors.append(f"unknown fetcher '{self.fetcher}'")
+
+        settings = source.get("config", {})
+        if not isinstance(settings, Mapping):
+            errors.append("\"config\" must be an object")
+            settings = {}
+        # Plans are shared between threads: keep a private, read-only copy
+        self.settings = source["config"] = MappingProxyType(copy.deepcopy(settings))
+
+        self.source_field = source.get("source_field", 0)
+        if not isinstance(self.source_field, int) or self.source_field < 0:
+            errors.append(f"\"source_field\" must be a field index, not {self.source_field!r}")
+            self.source_field = 0
+
+        mapping = source.get("mapping", {})
+        fields = []
+        if isinstance(mapping, Mapping):
+            for key, idx in mapping.items():
+                if not isinstance(idx, int):
+                    errors.append(f"mapping '{key}' must be a field index, not {idx!r}")
+                elif idx >= 0:
+                    fields.append((key, idx))
+            source["mapping"] = MappingProxyType(dict(mapping))
+        else:
+            errors.append("\"mapping\" must be an object")
+        self.fields = tuple(fields)
+
+        # Combined sources: compile the sub-sources too, so fetches through
+        # them use plans as well.  Sub-sources that are already plans (named
+        # sources of the same note type) report their own errors.
+        if isinstance(source.get("sources"), list):
+            subs = []
+            for sub in source["sources"]:
+                if isinstance(sub, SourcePlan):
+                    subs.append(sub)
+                elif isinstance(sub, Mapping):
+                    sub = SourcePlan(sub, known_fetchers)
+                    errors.extend(f"{sub.name}: {e}" for e in sub.errors)
+                    subs.append(sub)
+            self.sources = source["sources"] = tuple(subs)
+        else:
+            self.sources = ()
+
+        for key, path in self.settings.items():
+            if key.endswith("_path") and not (isinstance(path, str) and os.path.isfile(os.path.expanduser(path))):
+                errors.append(f"\"{key}\" {path!r} is not a file")
+        errors.extend(self._check_columns())
+
+        self._source = source
+        self.errors = tuple(errors)
+        self._columns = {}
+        self._columns_lock = threading.Lock()
+
+    @classmethod
+    def of(cls, config):
+        """Return config as a plan, compiling it if it is a plain dict."""
+        return config if isinstance(config, SourcePlan) else cls(config)
+
+    def _check_columns(self):
+        """Check CSV mapping keys and search columns against the file's header."""
+        path = self.settings.get("csv_path")
+        if not isinstance(path, str) or not os.path.isfile(os.path.expanduser(path)):
+            return []
+        try:
+            header = _read_header(os.path.expanduser(path), self.settings.get("delimiter", "\t"))
+        except (OSError, ValueError) as e:
+            return [f"could not read {path}: {e}"]
+        wanted = [key for key, _ in self.fields]
+        for key in ("csv_search_field", "csv_lemma_field"):
+            if key in self.settings:
+                wanted.append(self.settings[key])
+        return [f"column '{name}' not in the header of {path}" for name in wanted if name not in header]
+
+    # ------------------------------------------------------------------ #
+    # Hot path
+    # ------------------------------------------------------------------ #
+    def columns(self, header):
+        """
+        Return ((column index, note field index), ...) for the mapped keys
+        found in header.  Resolved once per distinct header.
+        """
+        key = tuple(header)
+        columns = self._columns.get(key)
+        if columns is None:
+            position = {}
+            for i, name in enumerate(key):
+                position.setdefault(name, i)
+            missing = [name for name, _ in self.fields if name not in position]
+            if missing:
+                logger.warning("Fields %s of source '%s' not in header %s", missing, self.name, list(key))
+            columns = tuple((position[name], idx) for name, idx in self.fields if name in position)
+            with self._columns_lock:
+                self._columns[key] = columns
+        return columns
+
+    def project_row(self, header, row):
+        """Map a table row to {note_field_idx: value}."""
+        return {idx: row[col] for col, idx in self.columns(header) if col < len(row)}
+
+    def project(self, values):
+        """Map a {mapping key: value} dict to {note_field_idx: value}."""
+        return {idx: values.get(key, "") for key, idx in self.fields}
+
+    # ------------------------------------------------------------------ #
+    # Mapping interface (read-only)
+    # ------------------------------------------------------------------ #
+    def __getitem__(self, key):
+        return self._source[key]
+
+    def __iter__(self):
+        return iter(self._source)
+
+    def __len__(self):
+        return len(self._source)
+
+    # Plans are compared and hashed by identity, like the config they replace
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f"<SourcePlan {self.name!r} ({self.fetcher})>"
@@ -0,0 +1,263 @@
+"""
+CSV dictionaries compiled into indexed SQLite files.
+
+compile_csv() streams a CSV into a SQLite database in bulk transactions
+(memory use is bounded by the batch size, not the file) and indexes the
+search column plus any secondary columns.  SQLiteDictionary then answers
+lookups with indexed point queries and returns rows in the same list form
+as CSVSeeker, so the local_sqlite fetcher can reuse the CSV mappings.
+
+Command line:
+
+    python -m quickfill.sqlite_dict ecdict.csv --search-field word --delimiter , --index phonetic
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .csv_index import file_stamp
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+DEFAULT_BATCH_SIZE = 10000
+# SQLite's default limit on host parameters in one statement is 999
+MAX_QUERY_PARAMS = 900
+
+
+def default_db_path(csv_path):
+    """Where a compiled dictionary is written unless told otherwise."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".sqlite3")
+
+
+def _column(i):
+    # Header names can be empty, duplicated or SQL keywords; columns are
+    # numbered instead and the header is kept in the meta table.
+    return f"c{i}"
+
+
+def compile_csv(csv_path, search_field, db_path=None, delimiter="\t", index_fields=(),
+                batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import a CSV into a new SQLite dictionary.
+
+    Args:
+        csv_path (str): CSV file with a header row.
+        search_field (str): Header name of the column lookups search.
+        db_path (str): Output file; defaults to <csv>.sqlite3 next to the CSV.
+        delimiter (str): CSV delimiter.
+        index_fields (iterable): Further header names to index.
+        batch_size (int): Rows inserted per executemany() call.
+        progress (callable): Called as progress(rows_done, bytes_done, bytes_total).
+
+    Returns:
+        tuple: (db_path, number of rows imported)
+    """
+    csv_path = Path(csv_path).expanduser()
+    db_path = Path(db_path).expanduser() if db_path else default_db_path(csv_path)
+    stamp = file_stamp(csv_path)
+    tmp_path = db_path.with_name(f"{db_path.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    rows_done = 0
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, [])
+        missing = [name for name in (search_field, *index_fields) if name not in header]
+        if missing:
+            raise ValueError(f"Columns {missing} not in CSV header {header}")
+        width = len(header)
+
+        db = sqlite3.connect(tmp_path)
+        try:
+            # Nothing else can see the file until it is renamed into place,
+            # so skip journaling and fsyncs during the import
+            db.execute("PRAGMA journal_mode=OFF")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            columns = ", ".join(f"{_column(i)} TEXT" for i in range(width))
+            db.execute(f"CREATE TABLE entries ({columns})")
+            insert = (f"INSERT INTO entries VALUES ({', '.join('?' * width)})")
+
+            batch = []
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) != width:
+                    row = (row + [""] * width)[:width]
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    with db:
+                        db.executemany(insert, batch)
+                    rows_done += len(batch)
+                    batch = []
+                    if progress:
+                        progress(rows_done, f.buffer.tell(), stamp[0])
+            with db:
+                db.executemany(insert, batch)
+            rows_done += len(batch)
+
+            # Building indexes after the import is much faster than
+            # maintaining them row by row
+            indexed = [search_field] + [name for name in index_fields if name != search_field]
+            for name in dict.fromkeys(indexed):
+                i = header.index(name)
+                db.execute(f"CREATE INDEX entries_{_column(i)} ON entries({_column(i)})")
+            meta = {
+                "version": SCHEMA_VERSION,
+                "header": header,
+                "search_field": search_field,
+                "indexed": indexed,
+                "delimiter": delimiter,
+                "source": str(csv_path),
+                "source_stamp": stamp,
+                "rows": rows_done,
+                "compiled": time.time(),
+            }
+            with db:
+                db.executemany("INSERT INTO meta VALUES (?, ?)",
+                               [(k, json.dumps(v)) for k, v in meta.items()])
+            db.execute("ANALYZE")
+        except BaseException:
+            # A failed or interrupted import leaves no half-built file behind
+            db.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            db.close()
+
+    os.replace(tmp_path, db_path)
+    if progress:
+        progress(rows_done, stamp[0], stamp[0])
+    logger.debug("Compiled %s rows from %s into %s", rows_done, csv_path, db_path)
+    return str(db_path), rows_done
+
+
+class SQLiteDictionary:
+    """
+    Read-only lookups in a compiled dictionary.
+
+    Offers the CSVSeeker lookup interface (header, search, search_many,
+    is_stale, memory_usage, close), so it can live in the seeker pool.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path).expanduser()
+        if not self.db_path.is_file():
+            raise FileNotFoundError(f"Dictionary not found: {self.db_path}")
+        self.stamp = file_stamp(self.db_path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                   check_same_thread=False)
+        try:
+            meta = {k: json.loads(v) for k, v in self._db.execute("SELECT key, value FROM meta")}
+        except sqlite3.DatabaseError as e:
+            self._db.close()
+            raise ValueError(f"{self.db_path} is not a compiled QuickFill dictionary: {e}")
+        if meta.get("version") != SCHEMA_VERSION:
+            self._db.close()
+            raise ValueError(f"{self.db_path} was compiled by an incompatible version; recompile it")
+        self.meta = meta
+        self.header = meta["header"]
+        self.search_field = meta["search_field"]
+        self._select = ", ".join(_column(i) for i in range(len(self.header)))
+
+        source = meta.get("source")
+        try:
+            if source and file_stamp(source) != meta.get("source_stamp"):
+                logger.warning("%s changed since %s was compiled; recompile it to pick up the changes",
+                               source, self.db_path)
+        except OSError:
+            pass
+
+    def search(self, word, field=None):
+        return self.search_many([word], field)[word]
+
+    def search_many(self, words, field=None):
+        """
+        Look up words in the search column (or another column, which is
+        only fast if it was indexed at compile time).
+
+        Returns:
+            dict: word -> list of matching rows (empty list for misses).
+        """
+        results = {word: [] for word in words}
+        column = _column(self.header.index(field or self.search_field))
+        unique = list(results)
+        with self._lock:
+            for start in range(0, len(unique), MAX_QUERY_PARAMS):
+                chunk = unique[start:start + MAX_QUERY_PARAMS]
+                query = (f"SELECT {column}, {self._select} FROM entries "
+                         f"WHERE {column} IN ({', '.join('?' * len(chunk))}) ORDER BY rowid")
+                for key, *row in self._db.execute(query, chunk):
+                    results[key].append(row)
+        return results
+
+    def suggest(self, word, limit=10, max_distance=0):
+        """
+        Return up to limit headwords starting with word, using the search
+        column's index.  Fuzzy matching (max_distance) isn't supported for
+        compiled dictionaries.
+        """
+        word = word.strip()
+        if not word:
+            return []
+        column = _column(self.header.index(self.search_field))
+        # Every string starting with word sorts between word and word + U+10FFFF
+        query = (f"SELECT DISTINCT {column} FROM entries WHERE {column} >= ? AND {column} < ? "
+                 f"ORDER BY {column} LIMIT ?")
+        with self._lock:
+            return [key for key, in self._db.execute(query, (word, word + "\U0010ffff", limit))]
+
+    def is_indexed(self, field):
+        return field in self.meta.get("indexed", ())
+
+    def is_stale(self):
+        """True if the database file was replaced (e.g. recompiled) since it was opened."""
+        try:
+            return file_stamp(self.db_path) != self.stamp
+        except OSError:
+            return True
+
+    def memory_usage(self):
+        # Pages are cached by SQLite within its own small default budget
+        return 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compile a CSV dictionary into an indexed SQLite file.")
+    ap.add_argument("csv_path", help="CSV file with a header row")
+    ap.add_argument("--search-field", required=True, help="column that lookups search")
+    ap.add_argument("--delimiter", default="\\t", help="CSV delimiter (default: tab)")
+    ap.add_argument("--index", action="append", default=[], metavar="FIELD",
+                    help="also index this column (repeatable)")
+    ap.add_argument("--db", help="output file (default: <csv>.sqlite3)")
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = ap.parse_args(argv)
+
+    delimiter = args.delimiter.encode("utf-8").decode("unicode_escape")
+
+    def progress(rows, done, total):
+        print(f"\r{rows} rows ({100 * done // max(total, 1)}%)", end="", file=sys.stderr)
+
+    db_path, rows = compile_csv(args.csv_path, args.search_field, db_path=args.db, delimiter=delimiter,
+                                index_fields=args.index, batch_size=args.batch_size, progress=progress)
+    print(f"\nWrote {rows} rows to {db_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())